@@ -0,0 +1,80 @@
+"""
+Local-mode benchmark of the write stage in debug_demo.py.
+
+Writes synthetic GSOD-shaped readings through `write_output` against a local S3 stand-in
+(MinIO, or `moto_server`) so committers and file sizing can be compared without EMR.
+
+    moto_server -p 5000 &
+    aws --endpoint-url http://localhost:5000 s3 mb s3://bench
+    python bench_write.py --endpoint http://localhost:5000 --bucket bench
+
+Without `--endpoint`, the benchmark writes to a local temporary directory instead.
+"""
+import argparse
+import tempfile
+import time
+
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame, SparkSession
+
+from debug_demo import configure_committer, write_output
+
+HADOOP_CLOUD_PACKAGES = "org.apache.hadoop:hadoop-aws:3.3.4,org.apache.spark:spark-hadoop-cloud_2.12:3.4.1"
+
+
+def synthetic_readings(spark: SparkSession, stations: int, years: int) -> DataFrame:
+    """
+    One reading per station per day, with the columns the write stage relies on.
+    """
+    days = spark.range(years * 365).select(f.date_add(f.lit("2000-01-01"), f.col("id").cast("int")).alias("DATE"))
+    ids = spark.range(stations).select((f.lit(72000000000) + f.col("id")).alias("STATION"))
+    return (
+        ids.crossJoin(days)
+        .withColumn("NAME", f.concat(f.lit("STATION "), f.col("STATION"), f.lit(", WA US")))
+        .withColumn("TEMP", f.rand(seed=42) * 100)
+        .withColumn("location_title", f.col("NAME"))
+    )
+
+
+def session(committer: str, endpoint: str = None) -> SparkSession:
+    builder = SparkSession.builder.master("local[*]").appName("BenchWrite")  # type: ignore
+    if endpoint:
+        builder = (
+            builder.config("spark.jars.packages", HADOOP_CLOUD_PACKAGES)
+            .config("spark.hadoop.fs.s3a.endpoint", endpoint)
+            .config("spark.hadoop.fs.s3a.path.style.access", "true")
+            .config("spark.hadoop.fs.s3a.connection.ssl.enabled", str(endpoint.startswith("https")).lower())
+            .config("spark.hadoop.fs.s3a.access.key", "test")
+            .config("spark.hadoop.fs.s3a.secret.key", "test")
+        )
+    return configure_committer(builder, committer).getOrCreate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the partitioned Parquet write path locally")
+    parser.add_argument("--endpoint", help="S3 stand-in endpoint, e.g. http://localhost:5000")
+    parser.add_argument("--bucket", default="bench")
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--max-records-per-file", type=int, nargs="+", default=[1_000_000, 100])
+    args = parser.parse_args()
+
+    # The magic committer only applies to S3A, so only compare it against the stand-in
+    committers = ["default", "magic"] if args.endpoint else ["default"]
+    root = f"s3a://{args.bucket}/bench-write" if args.endpoint else tempfile.mkdtemp(prefix="bench-write-")
+
+    print(f"{'committer':<10} {'maxRecordsPerFile':>18} {'seconds':>8}")
+    for committer in committers:
+        spark = session(committer, args.endpoint)
+        readings = synthetic_readings(spark, args.stations, args.years).cache()
+        readings.count()
+        for max_records in args.max_records_per_file:
+            start = time.perf_counter()
+            write_output(readings, f"{root}/{committer}-{max_records}", max_records)
+            print(f"{committer:<10} {max_records:>18} {time.perf_counter() - start:>8.2f}")
+        # Committer settings are fixed when the session is created
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Capture the input of a failing UDF or mapPartitions function so it can be replayed locally.
+
+On EMR, wrap the function before handing it to Spark:
+
+    udf_camelize = f.udf(capture_udf(convert_to_camel_case, "s3://bucket/captures"), StringType())
+    rdd.mapPartitions(capture_partitions(parse_rows, "s3://bucket/captures"))
+
+When the function raises, the offending row and the rows that came before it in the same
+partition (up to `limit`) are written to `<uri>/<function name>/<capture id>/input.parquet`.
+The stack trace is stored in the Parquet file metadata. The original exception is always re-raised.
+
+Then, on your local machine, feed that slice back into the same function under the debugger:
+
+    python capture.py s3://bucket/captures/convert_to_camel_case/<capture id> debug_demo:convert_to_camel_case
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import traceback
+import uuid
+from collections import deque
+from functools import wraps
+from typing import Optional
+
+DEFAULT_LIMIT = 1000
+
+
+def capture_udf(fn, uri: str, limit: int = DEFAULT_LIMIT):
+    """
+    Wrap a row-at-a-time UDF. Arguments are recorded as `arg0`, `arg1`, ...
+    """
+    seen = deque(maxlen=limit)
+    current = {"partition": None}
+    # Resolved on the driver, where we can still tell which script `__main__` is
+    spec = function_spec(fn)
+
+    @wraps(fn)
+    def wrapper(*args):
+        # Python workers are reused across tasks, so start over when the partition changes
+        partition = _partition_id()
+        if partition != current["partition"]:
+            seen.clear()
+            current["partition"] = partition
+        seen.append(args)
+        try:
+            return fn(*args)
+        except Exception:
+            rows = [{f"arg{i}": value for i, value in enumerate(row)} for row in seen]
+            _write_capture(uri, fn, spec, "udf", rows, None, traceback.format_exc())
+            raise
+
+    return wrapper
+
+
+def capture_partitions(fn, uri: str, limit: int = DEFAULT_LIMIT):
+    """
+    Wrap a mapPartitions function. The last row the function consumed is treated as the offending one.
+    """
+    spec = function_spec(fn)
+
+    @wraps(fn)
+    def wrapper(iterator):
+        seen = deque(maxlen=limit)
+
+        def recording():
+            for item in iterator:
+                seen.append(item)
+                yield item
+
+        try:
+            yield from fn(recording())
+        except Exception:
+            rows, shapes = zip(*[_row_to_dict(item) for item in seen]) if seen else ((), ())
+            _write_capture(uri, fn, spec, "partitions", list(rows), list(shapes), traceback.format_exc())
+            raise
+
+    return wrapper
+
+
+def _partition_id():
+    try:
+        from pyspark import TaskContext
+
+        ctx = TaskContext.get()
+        return (ctx.stageId(), ctx.partitionId(), ctx.attemptNumber()) if ctx else None
+    except ImportError:
+        return None
+
+
+def function_spec(fn) -> str:
+    """
+    Return `module:qualname` for `fn`. Functions defined in the job script itself live in `__main__`
+    under spark-submit, so use the script's file name instead.
+    """
+    module = fn.__module__
+    if module == "__main__":
+        main_file = getattr(sys.modules.get("__main__"), "__file__", None)
+        if main_file:
+            module = os.path.splitext(os.path.basename(main_file))[0]
+    return f"{module}:{fn.__qualname__}"
+
+
+def _row_to_dict(item):
+    """
+    Return the item as a dict along with its shape, so replay can rebuild exactly what Spark passed in.
+    """
+    if hasattr(item, "asDict"):
+        values = item.asDict()
+        return values, ["row", list(values)]
+    if isinstance(item, tuple):
+        return {f"_{i + 1}": value for i, value in enumerate(item)}, ["tuple", len(item)]
+    return {"value": item}, ["value", None]
+
+
+def _from_dict(row: dict, shape: list):
+    kind, fields = shape
+    if kind == "row":
+        values = {name: row[name] for name in fields}
+        try:
+            from pyspark.sql import Row
+
+            return Row(**values)
+        except ImportError:
+            return values
+    if kind == "tuple":
+        return tuple(row[f"_{i + 1}"] for i in range(fields))
+    return row["value"]
+
+
+def _filesystem(uri: str):
+    from pyarrow import fs
+
+    # pyarrow only takes absolute local paths
+    if "://" not in uri:
+        uri = os.path.abspath(uri)
+    return fs.FileSystem.from_uri(uri.rstrip("/"))
+
+
+def _write_capture(uri: str, fn, spec: str, kind: str, rows: list, shapes: Optional[list], trace: str) -> None:
+    # Anything that goes wrong here must not hide the original exception
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Items of different shapes end up with different keys, give every row all of them
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        rows = [{key: row.get(key) for key in columns} for row in rows]
+        repr_fallback = False
+        try:
+            table = pa.Table.from_pylist(rows)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            table = pa.Table.from_pylist([{k: repr(v) for k, v in row.items()} for row in rows])
+            repr_fallback = True
+        table = table.replace_schema_metadata(
+            {
+                "capture.kind": kind,
+                "capture.function": spec,
+                "capture.partition": json.dumps(_partition_id()),
+                "capture.failed_index": str(len(rows) - 1),
+                "capture.shapes": json.dumps(shapes),
+                "capture.repr_fallback": json.dumps(repr_fallback),
+                "capture.traceback": trace,
+            }
+        )
+
+        filesystem, path = _filesystem(uri)
+        path = f"{path}/{fn.__name__}/{uuid.uuid4().hex[:12]}"
+        filesystem.create_dir(path)
+        pq.write_table(table, f"{path}/input.parquet", filesystem=filesystem)
+        location = f"{uri.split('://')[0]}://{path}" if "://" in uri else path
+        print(f"=== CAPTURED {len(rows)} INPUT ROWS TO {location} ===", file=sys.stderr)
+    except Exception as e:
+        print(f"=== FAILED TO CAPTURE INPUT ROWS: {e!r} ===", file=sys.stderr)
+
+
+def load_capture(uri: str):
+    """
+    Read a capture back, returning its metadata and rows.
+    """
+    import pyarrow.parquet as pq
+
+    filesystem, path = _filesystem(uri)
+    table = pq.read_table(f"{path}/input.parquet", filesystem=filesystem)
+    meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+    return meta, table.to_pylist()
+
+
+def replay(fn, meta: dict, rows: list):
+    """
+    Feed captured rows into `fn` exactly as Spark would have.
+    """
+    if json.loads(meta.get("capture.repr_fallback", "false")):
+        print(
+            "WARNING: the captured values couldn't be stored as Parquet and were saved as their repr() strings, "
+            "so the function is replayed with strings rather than the original values",
+            file=sys.stderr,
+        )
+
+    if meta["capture.kind"] == "udf":
+        return [fn(*row.values()) for row in rows]
+
+    shapes = json.loads(meta.get("capture.shapes", "null")) or [["row", list(row)] for row in rows]
+    items = [_from_dict(row, shape) for row, shape in zip(rows, shapes)]
+    return list(fn(iter(items)))
+
+
+def resolve(spec: str):
+    module_name, _, attr = spec.partition(":")
+    target = importlib.import_module(module_name)
+    for part in attr.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured partition slice into the failing function")
+    parser.add_argument("capture_uri", help="s3:// or local path of the capture directory")
+    parser.add_argument("function", nargs="?", help="module:function to replay into, defaults to the captured one")
+    parser.add_argument("--pdb", action="store_true", help="drop into pdb post-mortem when the function raises")
+    args = parser.parse_args()
+
+    meta, rows = load_capture(args.capture_uri)
+    print(f"Captured {meta['capture.kind']} failure in {meta['capture.function']}, {len(rows)} rows")
+    print(meta["capture.traceback"])
+
+    fn = resolve(args.function or meta["capture.function"])
+    try:
+        replay(fn, meta, rows)
+    except Exception:
+        if not args.pdb:
+            raise
+        import pdb
+
+        traceback.print_exc()
+        pdb.post_mortem()
+    else:
+        print("Replay completed without an exception")
+
+
+if __name__ == "__main__":
+    main()
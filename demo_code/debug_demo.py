@@ -1,16 +1,36 @@
+import argparse
 import os
+import time
+from functools import reduce
 
 import pyspark.sql.functions as f
-from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import DataFrame, SparkSession, Window
 from pyspark.sql.types import StringType
 
+
+def mark(phase: str):
+    # Timing markers read by emr_remote_debugging/tools/timing.py from the driver stdout
+    print(f"DEBUG_TIMING {phase} {time.time():.3f}", flush=True)
+
+
+mark("script_start")
+
 host = os.environ.get("DEBUG_HOST")
 port = os.environ.get("DEBUG_PORT")
-if host and port:
+if os.environ.get("DEBUG_MODE") == "postmortem":
+    # Only connect to the debugger (or dump to S3) when an exception goes unhandled
+    print("=== ENABLING POST-MORTEM DEBUG MODE ===")
+    import postmortem
+
+    postmortem.install(host, port, os.environ.get("DEBUG_DUMP_URI"))
+elif host and port:
     print("=== ENABLING DEBUG MODE ===")
     import pydevd_pycharm
 
+    # settrace suspends until Resume is clicked, so mark when the job is ready for the debugger too
+    mark("debugger_connect_start")
     pydevd_pycharm.settrace(host, port=int(port), stdoutToServer=True, stderrToServer=True)
+    mark("debugger_attached")
 
 
 def convert_to_camel_case(location):
@@ -18,26 +38,184 @@ def convert_to_camel_case(location):
     return f"{parts[0].title()},{parts[1]}"
 
 
+def gsod_uri(year: int) -> str:
+    return f"s3://noaa-gsod-pds/{year}/72793524234.csv"
+
+
 def load_data(ss: SparkSession, year: int) -> DataFrame:
     """
     Load data from NOAA GSOD for the specified year.
     """
-    return ss.read.csv(f"s3://noaa-gsod-pds/{year}/72793524234.csv", header=True, inferSchema=True)
+    return ss.read.csv(gsod_uri(year), header=True, inferSchema=True)
+
+
+def load_stations(ss: SparkSession, uri: str) -> DataFrame:
+    """
+    Load NOAA ISD station metadata, keyed like the GSOD STATION column (USAF + WBAN).
+    A station can be listed more than once, so only its most recent entry is kept to not multiply readings.
+    """
+    latest = Window.partitionBy("STATION").orderBy(f.col("END").desc_nulls_last())
+    return (
+        ss.read.csv(uri, header=True)
+        .withColumn("STATION", f.concat("USAF", "WBAN").cast("long"))
+        .withColumn("entry", f.row_number().over(latest))
+        .where(f.col("entry") == 1)
+        .select(
+            "STATION",
+            f.col("CTRY").alias("country"),
+            f.col("LAT").cast("double").alias("lat"),
+            f.col("LON").cast("double").alias("lon"),
+            f.col("`ELEV(M)`").cast("double").alias("elevation"),
+        )
+    )
+
 
+def estimated_size(df: DataFrame) -> int:
+    # Spark's own estimate from the optimized plan, this doesn't run a job
+    return int(df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes().toString())
 
-def run():
+
+def enrich(readings: DataFrame, stations: DataFrame, broadcast_threshold: int, buckets: int) -> DataFrame:
+    """
+    Add station metadata to each reading.
+    Small station tables are broadcast, larger ones are joined bucket by bucket instead of shipped to every task.
+    """
+    if estimated_size(stations) <= broadcast_threshold:
+        return readings.join(f.broadcast(stations), "STATION", "left")
+
+    # Co-partition both sides on the key so each task only joins one bucket of readings with one bucket of stations
+    return readings.repartition(buckets, "STATION").join(
+        stations.repartition(buckets, "STATION").hint("shuffle_hash"), "STATION", "left"
+    )
+
+
+def enriched_readings(
+    ss: SparkSession, years: list, stations: DataFrame, broadcast_threshold: int, buckets: int
+) -> DataFrame:
+    """
+    Load readings for the given years and add station metadata to them.
+    """
+    readings = reduce(DataFrame.unionByName, [load_data(ss, year) for year in years])
+    return enrich(readings, stations, broadcast_threshold, buckets)
+
+
+def configure_committer(builder: SparkSession.Builder, committer: str) -> SparkSession.Builder:
+    """
+    Use a committer that doesn't rename files on S3 when committing.
     """
-    Usage: debug
+    if committer == "magic":
+        # S3A outside of EMR, needs the spark-hadoop-cloud package on the classpath
+        return (
+            builder.config("spark.hadoop.fs.s3a.committer.name", "magic")
+            .config("spark.hadoop.fs.s3a.committer.magic.enabled", "true")
+            .config(
+                "spark.sql.sources.commitProtocolClass",
+                "org.apache.spark.internal.io.cloud.PathOutputCommitProtocol",
+            )
+            .config(
+                "spark.sql.parquet.output.committer.class",
+                "org.apache.spark.internal.io.cloud.BindingParquetOutputCommitter",
+            )
+        )
+    if committer == "emrfs":
+        # The EMRFS S3-optimized committer is the default on EMR, but make sure it's on
+        return builder.config("spark.sql.parquet.fs.optimized.committer.optimization-enabled", "true")
+    return builder
+
+
+def write_output(df: DataFrame, output: str, max_records_per_file: int) -> None:
+    """
+    Write readings as Parquet partitioned by year and station, sorted by date within each file.
+    """
+    (
+        df.withColumn("year", f.year("DATE"))
+        # One task per partition keeps the number of files down to what maxRecordsPerFile asks for
+        .repartition("year", "STATION")
+        .sortWithinPartitions("DATE")
+        .write.mode("overwrite")
+        .option("maxRecordsPerFile", max_records_per_file)
+        .partitionBy("year", "STATION")
+        .parquet(output)
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Basic script to demonstrate debugging")
+    parser.add_argument("--output", help="where to write the partitioned Parquet output, e.g. s3://bucket/output/gsod")
+    parser.add_argument("--committer", choices=["emrfs", "magic", "default"], default="emrfs")
+    parser.add_argument("--max-records-per-file", type=int, default=1_000_000)
+    parser.add_argument("--stations", default="s3://noaa-isd-pds/isd-history.csv", help="NOAA isd-history station list")
+    parser.add_argument("--broadcast-threshold-mb", type=int, default=32)
+    parser.add_argument("--station-buckets", type=int, default=64)
+    parser.add_argument("--cache-uri", help="reuse enriched readings from earlier runs, e.g. s3://bucket/cache")
+    return parser.parse_args(argv)
+
+
+def load_enriched(spark: SparkSession, args: argparse.Namespace, years: list, stations: DataFrame) -> DataFrame:
+    """
+    Enriched readings for the given years, reused from earlier runs when --cache-uri is set.
+    """
+    params = {
+        "years": years,
+        "broadcast_threshold": args.broadcast_threshold_mb * 1024 * 1024,
+        "buckets": args.station_buckets,
+    }
+    if not args.cache_uri:
+        return enriched_readings(spark, stations=stations, **params)
+
+    # Loading and enrichment only rerun when their code, parameters or input files change
+    from stage_cache import cached_stage
+
+    return cached_stage(
+        spark,
+        args.cache_uri,
+        enriched_readings,
+        params,
+        inputs=[gsod_uri(year) for year in years] + [args.stations],
+        dataframes={"stations": stations},
+        depends=[gsod_uri, load_data, load_stations, estimated_size, enrich],
+    )
+
+
+def run(argv=None):
+    """
+    Usage: debug [--output s3://bucket/prefix]
     Basic script to demonstrate debugging
     """
-    spark = SparkSession.builder.appName("RemoteDebug").getOrCreate()  # type: ignore
-    udf_camelize = f.udf(lambda x: convert_to_camel_case(x), StringType())
+    args = parse_args(argv)
+    builder = configure_committer(SparkSession.builder.appName("RemoteDebug"), args.committer)  # type: ignore
+    spark = builder.getOrCreate()
+    mark("spark_session_ready")
+    camelize = convert_to_camel_case
+
+    # Optionally capture the input of a failing UDF so it can be replayed locally with capture.py
+    capture_uri = os.environ.get("CAPTURE_URI")
+    if capture_uri:
+        from capture import capture_udf
+
+        camelize = capture_udf(convert_to_camel_case, capture_uri)
+
+    # Post-mortem debugging in the Python workers is opt-in as every failing row would stop
+    if os.environ.get("DEBUG_MODE") == "postmortem" and os.environ.get("DEBUG_WORKERS"):
+        import postmortem
+
+        camelize = postmortem.on_failure(camelize)
+    udf_camelize = f.udf(camelize, StringType())
+
+    # The station table is loaded once and reused for every join
+    stations = load_stations(spark, args.stations).cache()
+
     df = load_data(spark, 2023)
     print(f"{df.count()} records for 2023")
-    df = load_data(spark, 2022).withColumn("location_title", udf_camelize("NAME"))
+    df = load_enriched(spark, args, [2022], stations).withColumn("location_title", udf_camelize("NAME"))
     print(f"{df.count()} records for 2022")
     print(df.select("location_title").head())
 
+    if args.output:
+        readings = load_enriched(spark, args, [2023, 2022], stations).withColumn("location_title", udf_camelize("NAME"))
+        write_output(readings, args.output, args.max_records_per_file)
+        print(f"Wrote partitioned Parquet to {args.output}")
+
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,213 @@
+"""
+Post-mortem debugging with no overhead until something fails.
+
+Instead of calling `settrace` up front, `install` only registers an exception hook. When an
+unhandled exception happens, the hook connects to the pydevd server on the DevBox and stops
+on the exception so the frame stack can be inspected in PyCharm. If the debugger can't be reached
+or doesn't stop, the traceback and the locals of every frame are pickled to `dump_uri` instead.
+
+Exceptions in Python workers never reach `sys.excepthook`, so wrap UDFs and mapPartitions
+functions with `on_failure` to get the same behavior on executors.
+
+A dump can be inspected locally with:
+
+    python postmortem.py s3://bucket/postmortem/<dump name>.pickle
+"""
+import argparse
+import os
+import pickle
+import socket
+import sys
+import threading
+import time
+import traceback
+from functools import wraps
+from io import BytesIO
+
+# Seconds to wait for the debug server before falling back to a dump
+CONNECT_TIMEOUT = 10
+
+_config = {}
+
+
+def install(host: str = None, port: int = None, dump_uri: str = None) -> None:
+    """
+    Register the exception hook. Nothing else happens until an exception goes unhandled.
+    """
+    _config.update(host=host, port=port, dump_uri=dump_uri)
+    sys.excepthook = _excepthook
+
+
+def on_failure(fn):
+    """
+    Wrap a function that runs in a Python worker so its failures are handled like the driver's.
+    """
+    config = dict(_config)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            _config.update(config)
+            handle(*sys.exc_info())
+            raise
+
+    return wrapper
+
+
+def handle(exc_type, exc_value, tb) -> None:
+    host, port = _config.get("host"), _config.get("port")
+    if host and port:
+        try:
+            _post_mortem(host, port, exc_type, exc_value, tb)
+            return
+        except Exception as e:
+            # pydevd missing, or the connection failed, so at least keep a dump
+            print(f"=== FAILED TO CONNECT DEBUGGER: {e!r} ===", file=sys.stderr)
+    if _config.get("dump_uri"):
+        _dump(_config["dump_uri"], exc_type, exc_value, tb)
+
+
+def _excepthook(exc_type, exc_value, tb) -> None:
+    try:
+        handle(exc_type, exc_value, tb)
+    finally:
+        sys.__excepthook__(exc_type, exc_value, tb)
+
+
+def _post_mortem(host: str, port: int, exc_type, exc_value, tb) -> None:
+    print("=== UNHANDLED EXCEPTION, CONNECTING DEBUGGER ===")
+    import pydevd
+    import pydevd_pycharm
+
+    # Don't probe the port first, the debug server may take any connection as the debug session.
+    # settrace raises if it can't connect within the timeout, and handle() dumps instead.
+    os.environ.setdefault("PYDEVD_CONNECT_TIMEOUT", str(CONNECT_TIMEOUT))
+    pydevd_pycharm.settrace(host, port=int(port), suspend=False, stdoutToServer=True, stderrToServer=True)
+
+    # This is what pydevd itself does for "break on unhandled exceptions"
+    py_db = pydevd.get_global_debugger()
+    thread = threading.current_thread()
+    additional_info = py_db.set_additional_thread_info(thread)
+    additional_info.is_tracing += 1
+
+    # stop_on_unhandled_exception returns without stopping unless the IDE asked to break on this exception
+    suspended = []
+    do_wait_suspend = py_db.do_wait_suspend
+
+    def recording_wait_suspend(*args, **kwargs):
+        suspended.append(True)
+        return do_wait_suspend(*args, **kwargs)
+
+    py_db.do_wait_suspend = recording_wait_suspend
+    try:
+        py_db.stop_on_unhandled_exception(py_db, thread, additional_info, (exc_type, exc_value, tb))
+    finally:
+        del py_db.do_wait_suspend
+        additional_info.is_tracing -= 1
+        pydevd.stoptrace()
+    if not suspended:
+        raise RuntimeError(f"the debugger didn't stop on {exc_type.__name__}, is breaking on unhandled exceptions on?")
+
+
+def _safe_locals(frame) -> dict:
+    values = {}
+    for name, value in frame.f_locals.items():
+        try:
+            pickle.dumps(value)
+            values[name] = value
+        except Exception:
+            values[name] = repr(value)
+    return values
+
+
+def _filesystem(uri: str):
+    from pyarrow import fs
+
+    # pyarrow only takes absolute local paths
+    if "://" not in uri:
+        uri = os.path.abspath(uri)
+    return fs.FileSystem.from_uri(uri.rstrip("/"))
+
+
+def _dump(uri: str, exc_type, exc_value, tb) -> None:
+    frames = [
+        {
+            "filename": frame.f_code.co_filename,
+            "lineno": lineno,
+            "function": frame.f_code.co_name,
+            "locals": _safe_locals(frame),
+        }
+        for frame, lineno in traceback.walk_tb(tb)
+    ]
+    payload = pickle.dumps(
+        {
+            "exception": "".join(traceback.format_exception_only(exc_type, exc_value)).strip(),
+            "traceback": "".join(traceback.format_exception(exc_type, exc_value, tb)),
+            "frames": frames,
+        }
+    )
+
+    try:
+        filesystem, path = _filesystem(uri)
+        filesystem.create_dir(path)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{socket.gethostname()}-{os.getpid()}.pickle"
+        with filesystem.open_output_stream(f"{path}/{name}") as out:
+            out.write(payload)
+        print(f"=== DUMPED TRACEBACK TO {uri.rstrip('/')}/{name} ===", file=sys.stderr)
+    except Exception as e:
+        print(f"=== FAILED TO DUMP TRACEBACK: {e!r} ===", file=sys.stderr)
+
+
+class Unavailable:
+    """
+    Stands in for a class or function that can't be imported where the dump is loaded,
+    e.g. anything defined in the job script, which is `__main__` on the cluster.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+
+    def __repr__(self):
+        cls = type(self)
+        state = getattr(self, "__dict__", {})
+        return f"<unavailable {cls.__module__}.{cls.__qualname__} {state!r}>"
+
+
+class _Unpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        try:
+            return super().find_class(module, name)
+        except (AttributeError, ImportError):
+            return type(name, (Unavailable,), {"__module__": module, "__qualname__": name})
+
+
+def load(uri: str) -> dict:
+    filesystem, path = _filesystem(uri)
+    with filesystem.open_input_stream(path) as f:
+        return _Unpickler(BytesIO(f.read())).load()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a pickled traceback dump")
+    parser.add_argument("dump_uri", help="s3:// or local path of the dump")
+    parser.add_argument("--pdb", action="store_true", help="open pdb with the frames' locals loaded")
+    args = parser.parse_args()
+
+    dump = load(args.dump_uri)
+    print(dump["traceback"])
+    for depth, frame in enumerate(dump["frames"]):
+        print(f"#{depth} {frame['function']} ({frame['filename']}:{frame['lineno']})")
+        for name, value in frame["locals"].items():
+            print(f"    {name} = {value!r:.200}")
+
+    if args.pdb:
+        import pdb
+
+        frames = dump["frames"]
+        pdb.set_trace()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+pydevd type renderer for PySpark DataFrames.
+
+pydevd loads every `pydevd_plugin*` module under `pydevd_plugins.extensions`, so the Dockerfile copies
+this file next to pydevd's own plugins in the `pyspark_deps.tar.gz` virtualenv.
+
+In the variables view, a DataFrame shows its schema, a summary of its optimized plan and a preview of
+its first rows. Only the preview runs a Spark job: a `limit(N)` that is cancelled after a timeout and
+cached per DataFrame, so expanding the same variable again at the next breakpoint is instant.
+Nothing here ever calls `collect()` on the whole DataFrame. Use `page(df, n)` from the console to look
+further into a large result, one page at a time.
+"""
+import os
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+
+from _pydevd_bundle.pydevd_extension_api import StrPresentationProvider, TypeResolveProvider
+
+PREVIEW_ROWS = int(os.environ.get("SPARK_DEBUG_PREVIEW_ROWS", "20"))
+PREVIEW_TIMEOUT = float(os.environ.get("SPARK_DEBUG_PREVIEW_TIMEOUT", "10"))
+PLAN_CHARS = 2000
+
+_previews = weakref.WeakKeyDictionary()
+
+
+def _is_dataframe(type_object, type_name) -> bool:
+    # Checked by name so pyspark doesn't get imported when pydevd loads its plugins
+    return type_name == "DataFrame" and type_object.__module__ == "pyspark.sql.dataframe"
+
+
+def collect_with_timeout(df, timeout: float = PREVIEW_TIMEOUT) -> list:
+    """
+    Collect a (small) DataFrame in a job group that is cancelled if it takes longer than `timeout` seconds.
+    """
+    sc = df.sparkSession.sparkContext
+    group = f"pydevd-preview-{uuid.uuid4().hex[:8]}"
+    result = {}
+
+    def collect():
+        sc.setJobGroup(group, "Debugger preview", interruptOnCancel=True)
+        try:
+            result["rows"] = df.collect()
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=collect, name=group, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        sc.cancelJobGroup(group)
+        raise TimeoutError(f"preview took longer than {timeout}s and was cancelled")
+    if "error" in result:
+        raise result["error"]
+    return result["rows"]
+
+
+def preview(df, rows: int = PREVIEW_ROWS, timeout: float = PREVIEW_TIMEOUT) -> list:
+    cached = _previews.get(df)
+    if cached is not None and cached[0] == rows:
+        return cached[1]
+    values = collect_with_timeout(df.limit(rows), timeout)
+    _previews[df] = (rows, values)
+    return values
+
+
+def page(df, number: int, size: int = PREVIEW_ROWS, timeout: float = PREVIEW_TIMEOUT) -> list:
+    """
+    Return page `number` (starting at 0) of `df` without collecting the rest of it.
+    """
+    return collect_with_timeout(df.offset(number * size).limit(size), timeout)
+
+
+def plan_summary(df) -> str:
+    # Building the optimized plan analyzes the query but doesn't run it
+    plan = df._jdf.queryExecution().optimizedPlan().toString()
+    return plan if len(plan) <= PLAN_CHARS else plan[:PLAN_CHARS] + "\n..."
+
+
+# What the variables view shows when a DataFrame is expanded, each one is only computed when it is shown
+ATTRIBUTES = OrderedDict(
+    [
+        ("schema", lambda df: df._jdf.schema().treeString()),
+        ("columns", lambda df: df.columns),
+        ("is_cached", lambda df: df.is_cached),
+        ("plan", plan_summary),
+        (f"preview (first {PREVIEW_ROWS} rows)", preview),
+    ]
+)
+
+
+def _attribute(df, name: str):
+    try:
+        return ATTRIBUTES[name](df)
+    except Exception as e:
+        return f"<unavailable: {e}>"
+
+
+class DataFrameResolveProvider(TypeResolveProvider):
+    def can_provide(self, type_object, type_name):
+        return _is_dataframe(type_object, type_name)
+
+    def resolve(self, var, attribute):
+        return _attribute(var, attribute) if attribute in ATTRIBUTES else None
+
+    def get_dictionary(self, var):
+        return OrderedDict((name, _attribute(var, name)) for name in ATTRIBUTES)
+
+
+class DataFrameStrProvider(StrPresentationProvider):
+    def can_provide(self, type_object, type_name):
+        return _is_dataframe(type_object, type_name)
+
+    def get_str(self, val):
+        schema = val.schema.simpleString()
+        return f"DataFrame {schema if len(schema) <= 200 else schema[:200] + '...'}"
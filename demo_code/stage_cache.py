@@ -0,0 +1,167 @@
+"""
+Cross-run cache of intermediate DataFrames, so a debug iteration only recomputes the stages that changed.
+
+    readings = cached_stage(spark, "s3://bucket/cache", enriched_readings, params={"years": [2022]},
+                            inputs=["s3://noaa-gsod-pds/2022/72793524234.csv"], depends=[load_data])
+
+Each entry is stored as Parquet under `<cache uri>/<function name>/<key>/<generation>/`. The key is a hash of
+the source of the function (and of `depends`), its parameters and the paths, sizes and modification times of
+its inputs. Change any of those and the stage is recomputed.
+
+Entries are expired by the S3 lifecycle rule on the `cache/` prefix in `VPCStack`. The TTL is read from that
+rule, so the two can't disagree. An entry that's still being used is rewritten as a new generation once it's
+halfway through its TTL, so the rule evicts entries that haven't been used recently rather than every entry of
+a certain age.
+"""
+import hashlib
+import inspect
+import json
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from pyspark.sql import DataFrame, SparkSession
+
+# S3 can take up to a day after an object expires to delete it, so don't start reading entries that close
+EXPIRY_MARGIN_SECONDS = 24 * 60 * 60
+
+
+def _path(ss: SparkSession, path: str):
+    return ss.sparkContext._jvm.org.apache.hadoop.fs.Path(path)
+
+
+def _filesystem(ss: SparkSession, path: str):
+    hadoop_path = _path(ss, path)
+    return hadoop_path.getFileSystem(ss.sparkContext._jsc.hadoopConfiguration()), hadoop_path
+
+
+def _rule_prefix(rule: dict) -> Optional[str]:
+    # Rules that also filter on tags or object size don't apply to every cache object
+    rule_filter = rule.get("Filter", {})
+    if "Tag" in rule_filter or set(rule_filter.get("And", {})) - {"Prefix"}:
+        return None
+    if "Prefix" in rule_filter:
+        return rule_filter["Prefix"]
+    return rule_filter.get("And", {}).get("Prefix", rule.get("Prefix", ""))
+
+
+def lifecycle_ttl_days(s3, cache_uri: str) -> Optional[int]:
+    """
+    Return the number of days after which the bucket's lifecycle rules expire objects under `cache_uri`,
+    or None if nothing expires them.
+    """
+    scheme, _, location = cache_uri.partition("://")
+    if scheme not in ("s3", "s3a", "s3n"):
+        return None
+    bucket, _, prefix = location.partition("/")
+    key_prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+    try:
+        rules = s3.get_bucket_lifecycle_configuration(Bucket=bucket)["Rules"]
+    except s3.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchLifecycleConfiguration":
+            return None
+        raise
+
+    days = [
+        rule["Expiration"]["Days"]
+        for rule in rules
+        if rule.get("Status") == "Enabled"
+        and "Days" in rule.get("Expiration", {})
+        and _rule_prefix(rule) is not None
+        and key_prefix.startswith(_rule_prefix(rule))
+    ]
+    return min(days) if days else None
+
+
+def _fingerprint(ss: SparkSession, path: str) -> str:
+    try:
+        fs, hadoop_path = _filesystem(ss, path)
+        status = fs.getFileStatus(hadoop_path)
+        return f"{path}:{status.getLen()}:{status.getModificationTime()}"
+    except Exception:
+        # Not every input can be stat'ed, e.g. globs, so fall back to the path alone
+        return path
+
+
+def cache_key(
+    ss: SparkSession,
+    fn: Callable,
+    params: dict,
+    inputs: Iterable[str],
+    depends: Iterable[Callable] = (),
+) -> str:
+    digest = hashlib.sha256()
+    for source_fn in [fn, *depends]:
+        try:
+            digest.update(inspect.getsource(source_fn).encode())
+        except (OSError, TypeError):
+            # The source isn't always available, the bytecode is
+            digest.update(inspect.unwrap(source_fn).__code__.co_code)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    for path in sorted(inputs):
+        digest.update(_fingerprint(ss, path).encode())
+    return digest.hexdigest()[:32]
+
+
+def _latest_generation(ss: SparkSession, entry: str) -> Tuple[Optional[str], float]:
+    """
+    Return the newest complete generation of an entry and its age in seconds.
+    """
+    fs, hadoop_path = _filesystem(ss, entry)
+    if not fs.exists(hadoop_path):
+        return None, 0.0
+
+    latest, modified = None, 0.0
+    for status in fs.listStatus(hadoop_path):
+        if not status.isDirectory():
+            continue
+        generation = f"{entry}/{status.getPath().getName()}"
+        success = _path(ss, f"{generation}/_SUCCESS")
+        if fs.exists(success):
+            success_modified = fs.getFileStatus(success).getModificationTime() / 1000
+            if success_modified > modified:
+                latest, modified = generation, success_modified
+    return latest, time.time() - modified
+
+
+def cached_stage(
+    ss: SparkSession,
+    cache_uri: str,
+    fn: Callable[..., DataFrame],
+    params: Optional[dict] = None,
+    inputs: Iterable[str] = (),
+    depends: Iterable[Callable] = (),
+    dataframes: Optional[Dict[str, DataFrame]] = None,
+    s3=None,
+) -> DataFrame:
+    """
+    Return `fn(ss, **params, **dataframes)`, read from the cache if a valid entry exists and computed and written
+    to it otherwise. DataFrames aren't part of the key, so list the files they are read from in `inputs`.
+    """
+    if s3 is None and cache_uri.startswith("s3"):
+        import boto3
+
+        s3 = boto3.client("s3")
+    ttl_days = lifecycle_ttl_days(s3, cache_uri)
+    if ttl_days is not None and ttl_days < 2:
+        # With the expiry margin, a shorter TTL would make every entry too old to read
+        raise ValueError(f"The lifecycle rule on {cache_uri} expires objects after {ttl_days} day, 2 are needed")
+    params = params or {}
+    inputs = list(inputs)
+    key = cache_key(ss, fn, params, inputs, depends)
+    entry = f"{cache_uri.rstrip('/')}/{fn.__name__}/{key}"
+    ttl = ttl_days * 24 * 60 * 60 if ttl_days is not None else float("inf")
+
+    latest, age = _latest_generation(ss, entry)
+    if latest and age < ttl - EXPIRY_MARGIN_SECONDS:
+        print(f"=== STAGE CACHE HIT {fn.__name__} {latest} ===")
+        if age > ttl / 2:
+            # Rewrite entries that are still in use before the lifecycle rule expires them
+            fresh = f"{entry}/{int(time.time())}"
+            ss.read.parquet(latest).write.parquet(fresh)
+            latest = fresh
+        return ss.read.parquet(latest)
+
+    print(f"=== STAGE CACHE MISS {fn.__name__} {key} ===")
+    path = f"{entry}/{int(time.time())}"
+    fn(ss, **params, **(dataframes or {})).write.mode("overwrite").parquet(path)
+    return ss.read.parquet(path)
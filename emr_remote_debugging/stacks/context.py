@@ -0,0 +1,9 @@
+from constructs import Construct
+
+
+def context_flag(scope: Construct, key: str) -> bool:
+    # Values passed with --context are always strings, so "false" has to be parsed rather than tested for truth
+    value = scope.node.try_get_context(key)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
@@ -1,4 +1,4 @@
-from aws_cdk import Stack
+from aws_cdk import CfnMapping, Stack
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_eks as eks
 from aws_cdk import aws_iam as iam
@@ -6,6 +6,8 @@ from aws_cdk.lambda_layer_kubectl_v28 import KubectlV28Layer
 from cdk_eks_karpenter import Karpenter
 from constructs import Construct
 
+from emr_remote_debugging.stacks.context import context_flag
+
 
 class EKSStack(Stack):
     cluster_name: str
@@ -47,6 +49,17 @@ class EKSStack(Stack):
             iam.ManagedPolicy.from_aws_managed_policy_name("AmazonSSMManagedInstanceCore")
         )
 
+        # Optionally keep spare capacity and the EMR image warm so Spark pods start in seconds
+        headroom_pods = self.node.try_get_context("spark_headroom_pods")
+        if headroom_pods:
+            self.add_headroom(
+                int(headroom_pods),
+                self.node.try_get_context("spark_headroom_cpu") or "2",
+                self.node.try_get_context("spark_headroom_memory") or "8Gi",
+            )
+        if context_flag(self, "emr_image_prepull"):
+            self.add_image_prepull(self.node.try_get_context("emr_release_label") or "emr-6.15.0")
+
         self.add_admin_role_to_cluster()
         self.add_cluster_admin()
 
@@ -107,6 +120,112 @@ class EKSStack(Stack):
             },
         )
 
+    def add_headroom(self, replicas: int, cpu: str, memory: str, namespace: str = "headroom") -> None:
+        # Pause pods with a negative priority hold nodes open for Spark pods.
+        # Real pods preempt them, and the evicted pause pods make Karpenter launch the next node.
+        self.cluster.add_manifest(
+            "headroom",
+            {
+                "apiVersion": "v1",
+                "kind": "Namespace",
+                "metadata": {"name": namespace},
+            },
+            {
+                "apiVersion": "scheduling.k8s.io/v1",
+                "kind": "PriorityClass",
+                "metadata": {"name": "headroom"},
+                "value": -10,
+                "preemptionPolicy": "Never",
+                "globalDefault": False,
+                "description": "Placeholder pods that keep spare capacity for Spark",
+            },
+            {
+                "apiVersion": "apps/v1",
+                "kind": "Deployment",
+                "metadata": {"name": "headroom", "namespace": namespace},
+                "spec": {
+                    "replicas": replicas,
+                    "selector": {"matchLabels": {"app": "headroom"}},
+                    "template": {
+                        "metadata": {"labels": {"app": "headroom"}},
+                        "spec": {
+                            "priorityClassName": "headroom",
+                            "terminationGracePeriodSeconds": 0,
+                            "containers": [
+                                {
+                                    "name": "pause",
+                                    "image": "registry.k8s.io/pause:3.9",
+                                    "resources": {"requests": {"cpu": cpu, "memory": memory}},
+                                }
+                            ],
+                        },
+                    },
+                },
+            },
+        )
+
+    def add_image_prepull(self, release_label: str, namespace: str = "kube-system") -> None:
+        # EMR on EKS images live in a different account per region
+        # https://docs.aws.amazon.com/emr/latest/EMR-on-EKS-DevelopmentGuide/docker-custom-images-tag.html
+        image_uri = self.node.try_get_context("emr_image_uri")
+        if image_uri is None:
+            # fmt: off
+            accounts = CfnMapping(self, "EMRImageAccounts", mapping={
+                "ap-northeast-1": {"account": "059004520145"},
+                "ap-northeast-2": {"account": "996579266876"},
+                "ap-south-1": {"account": "235914868574"},
+                "ap-southeast-1": {"account": "671219180197"},
+                "ap-southeast-2": {"account": "038297999601"},
+                "ca-central-1": {"account": "351826393999"},
+                "eu-central-1": {"account": "107292555468"},
+                "eu-north-1": {"account": "830386416364"},
+                "eu-west-1": {"account": "483788554619"},
+                "eu-west-2": {"account": "118780647275"},
+                "eu-west-3": {"account": "307523725174"},
+                "sa-east-1": {"account": "052806832358"},
+                "us-east-1": {"account": "755674844232"},
+                "us-east-2": {"account": "711395599931"},
+                "us-west-1": {"account": "608033475327"},
+                "us-west-2": {"account": "895885662937"},
+            })
+            # fmt: on
+            account = accounts.find_in_map(self.region, "account")
+            image_uri = f"{account}.dkr.ecr.{self.region}.amazonaws.com/spark/{release_label}:latest"
+
+        # The init container pulls the image onto every new node and exits straight away
+        self.cluster.add_manifest(
+            "emr-image-prepull",
+            {
+                "apiVersion": "apps/v1",
+                "kind": "DaemonSet",
+                "metadata": {"name": "emr-image-prepull", "namespace": namespace},
+                "spec": {
+                    "selector": {"matchLabels": {"app": "emr-image-prepull"}},
+                    "template": {
+                        "metadata": {"labels": {"app": "emr-image-prepull"}},
+                        "spec": {
+                            "tolerations": [{"operator": "Exists"}],
+                            "initContainers": [
+                                {
+                                    "name": "prepull",
+                                    "image": image_uri,
+                                    "command": ["/bin/sh", "-c", "true"],
+                                    "resources": {"requests": {"cpu": "10m", "memory": "16Mi"}},
+                                }
+                            ],
+                            "containers": [
+                                {
+                                    "name": "pause",
+                                    "image": "registry.k8s.io/pause:3.9",
+                                    "resources": {"requests": {"cpu": "10m", "memory": "16Mi"}},
+                                }
+                            ],
+                        },
+                    },
+                },
+            },
+        )
+
     def add_provisioner(self, karp: Karpenter) -> None:
         karp.add_provisioner(
             "spot-provisioner",
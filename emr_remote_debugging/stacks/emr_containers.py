@@ -1,11 +1,17 @@
+import hashlib
+import json
+
 from aws_cdk import CfnJson, CfnOutput, Stack
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_eks as eks
 from aws_cdk import aws_emrcontainers as emrc
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_s3 as s3
+from aws_cdk import custom_resources as cr
 from constructs import Construct
 
+from emr_remote_debugging.stacks.context import context_flag
+
 
 class EMRContainersStack(Stack):
     virtual_cluster: emrc.CfnVirtualCluster
@@ -57,8 +63,12 @@ class EMRContainersStack(Stack):
         CfnOutput(self, "VirtualClusterID", value=self.virtual_cluster.attr_id)
         CfnOutput(self, "JobRoleArn", value=self.job_role.role_arn)
 
-        # Create a managed endpoint
-        # self.create_managed_endpoint()
+        # Optionally create a managed endpoint that keeps a warm driver for interactive debugging
+        if context_flag(self, "emr_managed_endpoint"):
+            self.create_managed_endpoint(
+                int(self.node.try_get_context("emr_endpoint_idle_timeout_minutes") or 60),
+                self.node.try_get_context("emr_release_label") or "emr-6.15.0",
+            )
 
     def create_namespace(self, name: str) -> eks.KubernetesManifest:
         return self.eks_cluster.add_manifest(
@@ -153,7 +163,12 @@ class EMRContainersStack(Stack):
             ],
         )
         self.bucket.grant_read_write(job_role)
+        # demo_code/stage_cache.py takes its TTL from the bucket's lifecycle rule
+        job_role.add_to_policy(
+            iam.PolicyStatement(actions=["s3:GetLifecycleConfiguration"], resources=[self.bucket.bucket_arn])
+        )
         s3.Bucket.from_bucket_name(self, "NOAABucket", "noaa-gsod-pds").grant_read(job_role)
+        s3.Bucket.from_bucket_name(self, "NOAAISDBucket", "noaa-isd-pds").grant_read(job_role)
 
         # Modify trust policy
         string_like = CfnJson(
@@ -209,7 +224,81 @@ class EMRContainersStack(Stack):
             name="EMRCluster",
         )
 
-    def create_managed_endpoint(self) -> None:
+    def create_managed_endpoint(self, idle_timeout_minutes: int, release_label: str) -> cr.AwsCustomResource:
+        # The managed endpoint needs the AWS Load Balancer Controller to expose Jupyter Enterprise Gateway
+        alb = self.create_load_balancer_controller()
+
+        # Managed endpoints can't be updated. Creating a new one on update gives it a new physical ID,
+        # which makes CloudFormation delete the old one. The name changes with the config to tell them apart.
+        config = hashlib.sha256(json.dumps([idle_timeout_minutes, release_label]).encode()).hexdigest()[:8]
+        create = cr.AwsSdkCall(
+            service="EMRcontainers",
+            action="createManagedEndpoint",
+            parameters={
+                "name": f"remote-debug-{config}",
+                "virtualClusterId": self.virtual_cluster.attr_id,
+                "type": "JUPYTER_ENTERPRISE_GATEWAY",
+                "releaseLabel": f"{release_label}-latest",
+                "executionRoleArn": self.job_role.role_arn,
+                "configurationOverrides": {
+                    "applicationConfiguration": [
+                        {
+                            # Kernels (and their driver and executor pods) are shut down once idle,
+                            # which lets Karpenter remove the nodes they were running on
+                            "classification": "jeg-config",
+                            "properties": {
+                                "KernelManager.cull_idle_timeout": str(idle_timeout_minutes * 60),
+                                "KernelManager.cull_interval": "60",
+                                "KernelManager.cull_connected": "true",
+                            },
+                        },
+                        {
+                            # Executors are released between cells while the driver stays warm
+                            "classification": "spark-defaults",
+                            "properties": {
+                                "spark.dynamicAllocation.enabled": "true",
+                                "spark.dynamicAllocation.shuffleTracking.enabled": "true",
+                                "spark.dynamicAllocation.minExecutors": "0",
+                                "spark.dynamicAllocation.executorIdleTimeout": "300s",
+                            },
+                        },
+                    ]
+                },
+            },
+            physical_resource_id=cr.PhysicalResourceId.from_response("id"),
+        )
+        endpoint = cr.AwsCustomResource(
+            self,
+            "ManagedEndpoint",
+            on_create=create,
+            on_update=create,
+            on_delete=cr.AwsSdkCall(
+                service="EMRcontainers",
+                action="deleteManagedEndpoint",
+                parameters={"id": cr.PhysicalResourceIdReference(), "virtualClusterId": self.virtual_cluster.attr_id},
+            ),
+            policy=cr.AwsCustomResourcePolicy.from_statements(
+                [
+                    iam.PolicyStatement(
+                        actions=[
+                            "emr-containers:CreateManagedEndpoint",
+                            "emr-containers:DeleteManagedEndpoint",
+                            "emr-containers:DescribeManagedEndpoint",
+                            "emr-containers:TagResource",
+                        ],
+                        resources=["*"],
+                    ),
+                    iam.PolicyStatement(actions=["iam:PassRole"], resources=[self.job_role.role_arn]),
+                ]
+            ),
+        )
+        endpoint.node.add_dependency(alb)
+        endpoint.node.add_dependency(self.virtual_cluster)
+
+        CfnOutput(self, "ManagedEndpointID", value=endpoint.get_response_field("id"))
+        return endpoint
+
+    def create_load_balancer_controller(self) -> eks.HelmChart:
         sa = self.eks_cluster.add_service_account(
             "studio-aws-load-balancer-controller",
             name="studio-aws-load-balancer-controller",
@@ -387,25 +476,20 @@ class EMRContainersStack(Stack):
             )
         )
 
-        self.eks_cluster.add_helm_chart(
+        chart = self.eks_cluster.add_helm_chart(
             "alb",
             namespace="kube-system",
             chart="aws-load-balancer-controller",
             repository="https://aws.github.io/eks-charts",
             values={
                 "clusterName": self.eks_cluster.cluster_name,
+                "region": self.region,
+                "vpcId": self.eks_cluster.vpc.vpc_id,
                 "serviceAccount": {"create": False, "name": "studio-aws-load-balancer-controller"},
             },
         )
-
-        # We still have to run a manual command
-        # aws emr-containers create-managed-endpoint \
-        # --type JUPYTER_ENTERPRISE_GATEWAY \
-        # --virtual-cluster-id ${EMR_EKS_CLUSTER_ID} \
-        # --name dacort-jeg \
-        # --execution-role-arn ${EMR_EKS_EXECUTION_ARN} \
-        # --release-label emr-6.2.0-latest \
-        # --certificate-arn ${JEG_CERT_ARN}
+        chart.node.add_dependency(sa)
+        return chart
 
 
 # Helpful references
@@ -67,5 +67,10 @@ class EMRServerlessStack(Stack):
     def create_job_execution_role(self) -> iam.Role:
         role = iam.Role(self, "JobRole", assumed_by=iam.ServicePrincipal("emr-serverless.amazonaws.com"))
         self.bucket.grant_read_write(role)
+        # demo_code/stage_cache.py takes its TTL from the bucket's lifecycle rule
+        role.add_to_policy(
+            iam.PolicyStatement(actions=["s3:GetLifecycleConfiguration"], resources=[self.bucket.bucket_arn])
+        )
         s3.Bucket.from_bucket_name(self, "NOAABucket", "noaa-gsod-pds").grant_read(role)
+        s3.Bucket.from_bucket_name(self, "NOAAISDBucket", "noaa-isd-pds").grant_read(role)
         return role
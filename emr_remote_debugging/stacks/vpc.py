@@ -1,4 +1,4 @@
-from aws_cdk import CfnOutput, RemovalPolicy, Stack
+from aws_cdk import CfnOutput, Duration, RemovalPolicy, Stack
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_s3 as s3
 from constructs import Construct
@@ -57,4 +57,16 @@ class VPCStack(Stack):
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
         )
 
+        # Entries in the stage cache expire after a TTL, demo_code/stage_cache.py rewrites the ones still in use
+        cache_ttl_days = int(self.node.try_get_context("stage_cache_ttl_days") or 7)
+        self.bucket.add_lifecycle_rule(
+            id="StageCache",
+            prefix="cache/",
+            expiration=Duration.days(cache_ttl_days),
+            # The bucket is versioned, so old versions have to go too
+            noncurrent_version_expiration=Duration.days(1),
+            abort_incomplete_multipart_upload_after=Duration.days(1),
+        )
+
         CfnOutput(self, "S3Bucket", value=self.bucket.bucket_name)
+        CfnOutput(self, "StageCacheURI", value=f"s3://{self.bucket.bucket_name}/cache")
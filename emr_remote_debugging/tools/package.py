@@ -0,0 +1,142 @@
+"""
+Content-addressed upload of job code for `--py-files`.
+
+Builds a deterministic zip of a Python package (or of the modules in a directory), names it by
+its SHA-256 and uploads it to the artifacts bucket from `VPCStack` only if that hash isn't there
+yet. Unchanged code is never uploaded twice, and the printed parameters always point at exactly
+the code that was packaged.
+
+    python -m emr_remote_debugging.tools.package demo_code --entry-point demo_code/debug_demo.py \\
+        --exclude pydevd_plugins bench_write.py bench_join.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import zipfile
+from io import BytesIO
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_PREFIX = "code/remote-debugging/cas"
+# Zip files can't represent dates before 1980
+FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+SKIP_DIRS = {"__pycache__", ".pytest_cache", ".mypy_cache", "dist", "build"}
+
+
+def collect_files(source: str, exclude: Iterable[str] = ()) -> List[Tuple[str, str]]:
+    """
+    Return sorted (path on disk, path in zip) pairs for the Python modules under `source`.
+    A package directory keeps its name in the zip so it's importable as a package, a plain directory is flattened.
+    """
+    source = os.path.normpath(source)
+    root = os.path.dirname(source) if os.path.exists(os.path.join(source, "__init__.py")) else source
+    excluded = set(exclude)
+
+    files = []
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+        for name in filenames:
+            if name.startswith(".") or not name.endswith(".py"):
+                continue
+            path = os.path.join(dirpath, name)
+            arcname = os.path.relpath(path, root).replace(os.sep, "/")
+            if name in excluded or any(arcname == e or arcname.startswith(e.rstrip("/") + "/") for e in excluded):
+                continue
+            files.append((path, arcname))
+    return sorted(files, key=lambda pair: pair[1])
+
+
+def build_zip(source: str, exclude: Iterable[str] = ()) -> bytes:
+    """
+    Zip `source` so the same files always produce the same bytes, whatever their timestamps or permissions.
+    """
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for path, arcname in collect_files(source, exclude):
+            info = zipfile.ZipInfo(arcname, date_time=FIXED_DATE_TIME)
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, "rb") as f:
+                zf.writestr(info, f.read(), compresslevel=9)
+    return buffer.getvalue()
+
+
+def content_key(data: bytes, filename: str, prefix: str = DEFAULT_PREFIX) -> str:
+    # The file keeps its name so Spark and Python see what they expect, e.g. debug_demo.py
+    return f"{prefix.rstrip('/')}/{hashlib.sha256(data).hexdigest()}/{filename}"
+
+
+def upload_if_missing(s3, bucket: str, key: str, data: bytes) -> bool:
+    """
+    Upload `data` unless the key already exists. Returns whether anything was uploaded.
+    """
+    response = s3.list_objects_v2(Bucket=bucket, Prefix=key, MaxKeys=1)
+    if any(o["Key"] == key for o in response.get("Contents", [])):
+        return False
+    s3.put_object(Bucket=bucket, Key=key, Body=data)
+    return True
+
+
+def package(
+    s3,
+    bucket: str,
+    source: str,
+    entry_point: Optional[str] = None,
+    archives: Optional[str] = None,
+    exclude: Iterable[str] = (),
+    prefix: str = DEFAULT_PREFIX,
+) -> dict:
+    """
+    Build and upload the `--py-files` zip (and the entry point, if given).
+    Returns the entry point URI, the `sparkSubmitParameters` to use and which keys were uploaded.
+    """
+    exclude = list(exclude)
+    if entry_point:
+        # The entry point is uploaded on its own, so keep it out of the zip
+        exclude.append(os.path.basename(entry_point))
+
+    name = os.path.basename(os.path.normpath(source)) + ".zip"
+    data = build_zip(source, exclude)
+    zip_key = content_key(data, name, prefix)
+    uploaded = [zip_key] if upload_if_missing(s3, bucket, zip_key, data) else []
+
+    params = [f"--py-files s3://{bucket}/{zip_key}"]
+    if archives:
+        params.insert(0, f"--archives {archives}")
+    result = {"sparkSubmitParameters": " ".join(params), "uploaded": uploaded}
+
+    if entry_point:
+        with open(entry_point, "rb") as f:
+            entry_data = f.read()
+        entry_key = content_key(entry_data, os.path.basename(entry_point), prefix)
+        if upload_if_missing(s3, bucket, entry_key, entry_data):
+            uploaded.append(entry_key)
+        result["entryPoint"] = f"s3://{bucket}/{entry_key}"
+    return result
+
+
+def main():
+    import boto3
+
+    from emr_remote_debugging.tools.timing import stack_outputs
+
+    parser = argparse.ArgumentParser(description="Package job code for --py-files and upload it by content hash")
+    parser.add_argument("source", help="package or directory of modules to zip")
+    parser.add_argument("--entry-point", help="job entry point, uploaded separately and left out of the zip")
+    parser.add_argument("--exclude", nargs="*", default=[], help="file names, zip paths or directories to leave out")
+    parser.add_argument("--bucket", help="defaults to the VPCStack.S3Bucket output")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    parser.add_argument("--region", default="us-west-2")
+    parser.add_argument("--no-archives", action="store_true", help="don't add the pyspark_deps.tar.gz archive")
+    args = parser.parse_args()
+
+    session = boto3.Session(region_name=args.region)
+    bucket = args.bucket or stack_outputs(session.client("cloudformation"), "VPCStack")["S3Bucket"]
+    archives = None if args.no_archives else f"s3://{bucket}/code/remote-debugging/pyspark_deps.tar.gz#environment"
+
+    result = package(session.client("s3"), bucket, args.source, args.entry_point, archives, args.exclude, args.prefix)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Client-side scheduler for debug job runs on the pre-initialized EMR Serverless capacity.
+
+`EMRServerlessStack` keeps a fixed number of warm drivers and executors. Runs that don't fit
+either queue inside EMR or spill over to cold on-demand workers, so this scheduler only admits
+a run when a warm driver is free and sizes `spark.executor.instances` to the free warm executors.
+
+Usage is read back from the application's active job runs on every poll, so several engineers
+running their own scheduler still see each other's runs. Each run is tagged with its user, which
+is what per-user fairness is based on.
+
+    python -m emr_remote_debugging.tools.scheduler --user ${USER} --executors 4 \\
+        s3://${S3_BUCKET}/code/remote-debugging/debug_demo.py \\
+        --spark-submit-parameters "--archives s3://${S3_BUCKET}/code/remote-debugging/pyspark_deps.tar.gz#environment"
+"""
+import argparse
+import re
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+USER_TAG = "debug-user"
+ACTIVE_STATES = ["SUBMITTED", "PENDING", "SCHEDULED", "RUNNING", "QUEUED"]
+EXECUTOR_INSTANCES = re.compile(r"spark\.executor\.instances=(\d+)")
+
+
+@dataclass
+class DebugRun:
+    user: str
+    entry_point: str
+    spark_submit_parameters: str = ""
+    executors: int = 4
+    min_executors: int = 1
+    name: str = "remote-debug"
+    job_run_id: Optional[str] = None
+    executor_instances: Optional[int] = None
+
+
+@dataclass
+class Usage:
+    drivers: int = 0
+    executors: int = 0
+    per_user: Dict[str, int] = field(default_factory=dict)
+
+
+class WarmCapacityScheduler:
+    def __init__(
+        self,
+        client,
+        application_id: str,
+        job_role_arn: str,
+        max_concurrent: Optional[int] = None,
+        max_per_user: Optional[int] = 1,
+        unmanaged_executors: int = 3,
+        log_uri: Optional[str] = None,
+    ):
+        self.client = client
+        self.application_id = application_id
+        self.job_role_arn = job_role_arn
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        # Runs submitted outside this scheduler don't say how many executors they use.
+        # 3 is the EMR Serverless default for spark.dynamicAllocation.initialExecutors.
+        self.unmanaged_executors = unmanaged_executors
+        self.log_uri = log_uri
+        self.queue: "OrderedDict[str, Deque[DebugRun]]" = OrderedDict()
+
+    def submit(self, run: DebugRun) -> None:
+        """
+        Queue a run. Raises ValueError if the run could never fit in the warm capacity, since it would wait forever.
+        """
+        drivers, executors = self.capacity()
+        if drivers < 1:
+            raise ValueError(f"Application {self.application_id} has no warm drivers to run on")
+        if self.max_per_user is not None and self.max_per_user < 1:
+            raise ValueError(f"max_per_user={self.max_per_user} doesn't allow any runs")
+        if run.min_executors > executors:
+            raise ValueError(
+                f"min_executors={run.min_executors} is more than the {executors} warm executors "
+                f"of application {self.application_id}"
+            )
+        self.queue.setdefault(run.user, deque()).append(run)
+
+    def pending(self) -> int:
+        return sum(len(runs) for runs in self.queue.values())
+
+    def capacity(self) -> Tuple[int, int]:
+        """
+        Return the number of warm (drivers, executors), starting the application if it has auto-stopped.
+        """
+        app = self.client.get_application(applicationId=self.application_id)["application"]
+        if app["state"] in ("CREATED", "STOPPED"):
+            self.client.start_application(applicationId=self.application_id)
+        initial = app.get("initialCapacity", {})
+        return (
+            initial.get("Driver", {}).get("workerCount", 0),
+            initial.get("Executor", {}).get("workerCount", 0),
+        )
+
+    def usage(self) -> Usage:
+        usage = Usage()
+        list_args = {"applicationId": self.application_id, "states": ACTIVE_STATES}
+        while True:
+            response = self.client.list_job_runs(**list_args)
+            for summary in response["jobRuns"]:
+                job_run = self.client.get_job_run(applicationId=self.application_id, jobRunId=summary["id"])["jobRun"]
+                params = job_run.get("jobDriver", {}).get("sparkSubmit", {}).get("sparkSubmitParameters", "")
+                # Spark uses the last value, and _start appends ours after the user's parameters
+                instances = EXECUTOR_INSTANCES.findall(params)
+                usage.drivers += 1
+                usage.executors += int(instances[-1]) if instances else self.unmanaged_executors
+                user = job_run.get("tags", {}).get(USER_TAG)
+                if user:
+                    usage.per_user[user] = usage.per_user.get(user, 0) + 1
+            if not response.get("nextToken"):
+                return usage
+            list_args["nextToken"] = response["nextToken"]
+
+    def poll(self) -> List[DebugRun]:
+        """
+        Admit as many queued runs as fit in the free warm capacity and return them.
+        """
+        if not self.pending():
+            return []
+
+        drivers, executors = self.capacity()
+        max_concurrent = min(drivers, self.max_concurrent or drivers)
+        usage = self.usage()
+
+        admitted = []
+        while self.pending():
+            run = self._next_run(usage)
+            if run is None or usage.drivers >= max_concurrent:
+                break
+            free = executors - usage.executors
+            if free < run.min_executors:
+                break
+
+            self.queue[run.user].popleft()
+            if not self.queue[run.user]:
+                del self.queue[run.user]
+            else:
+                # Round-robin between users with the same number of active runs
+                self.queue.move_to_end(run.user)
+
+            run.executor_instances = min(run.executors, free)
+            run.job_run_id = self._start(run)
+            usage.drivers += 1
+            usage.executors += run.executor_instances
+            usage.per_user[run.user] = usage.per_user.get(run.user, 0) + 1
+            admitted.append(run)
+        return admitted
+
+    def wait(
+        self,
+        sleep: Callable[[float], None] = time.sleep,
+        interval: float = 10,
+        on_admit: Callable[[DebugRun], None] = lambda run: None,
+    ) -> None:
+        while self.pending():
+            for run in self.poll():
+                on_admit(run)
+            if self.pending():
+                sleep(interval)
+
+    def _next_run(self, usage: Usage) -> Optional[DebugRun]:
+        # The user with the fewest active runs goes first, ties go to whoever has waited longest
+        candidates = [
+            user
+            for user in self.queue
+            if self.max_per_user is None or usage.per_user.get(user, 0) < self.max_per_user
+        ]
+        if not candidates:
+            return None
+        user = min(candidates, key=lambda u: usage.per_user.get(u, 0))
+        return self.queue[user][0]
+
+    def _start(self, run: DebugRun) -> str:
+        params = " ".join(
+            p
+            for p in [
+                run.spark_submit_parameters,
+                "--conf spark.dynamicAllocation.enabled=false",
+                f"--conf spark.executor.instances={run.executor_instances}",
+            ]
+            if p
+        )
+        overrides = {
+            "applicationConfiguration": [
+                {
+                    "classification": "spark-defaults",
+                    "properties": {"spark.pyspark.python": "./environment/bin/python"},
+                }
+            ]
+        }
+        if self.log_uri:
+            overrides["monitoringConfiguration"] = {"s3MonitoringConfiguration": {"logUri": self.log_uri}}
+
+        response = self.client.start_job_run(
+            name=run.name,
+            applicationId=self.application_id,
+            executionRoleArn=self.job_role_arn,
+            jobDriver={"sparkSubmit": {"entryPoint": run.entry_point, "sparkSubmitParameters": params}},
+            configurationOverrides=overrides,
+            tags={USER_TAG: run.user},
+        )
+        return response["jobRunId"]
+
+
+def main():
+    import boto3
+
+    from emr_remote_debugging.tools.timing import stack_outputs
+
+    parser = argparse.ArgumentParser(description="Submit a debug run once it fits in the warm EMR Serverless capacity")
+    parser.add_argument("entry_point")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--spark-submit-parameters", default="")
+    parser.add_argument("--executors", type=int, default=4, help="executors wanted, fewer are used if not free")
+    parser.add_argument("--min-executors", type=int, default=1)
+    parser.add_argument("--max-concurrent", type=int)
+    parser.add_argument("--max-per-user", type=int, default=1)
+    parser.add_argument("--region", default="us-west-2")
+    args = parser.parse_args()
+
+    session = boto3.Session(region_name=args.region)
+    cfn = session.client("cloudformation")
+    outputs = stack_outputs(cfn, "EMRServerless")
+    bucket = stack_outputs(cfn, "VPCStack")["S3Bucket"]
+
+    scheduler = WarmCapacityScheduler(
+        session.client("emr-serverless"),
+        outputs["ApplicationID"],
+        outputs["JobRoleArn"],
+        max_concurrent=args.max_concurrent,
+        max_per_user=args.max_per_user,
+        log_uri=f"s3://{bucket}/logs/emr-serverless/",
+    )
+    scheduler.submit(
+        DebugRun(
+            user=args.user,
+            entry_point=args.entry_point,
+            spark_submit_parameters=args.spark_submit_parameters,
+            executors=args.executors,
+            min_executors=args.min_executors,
+        )
+    )
+    print("Waiting for free warm capacity...")
+    scheduler.wait(on_admit=lambda run: print(f"Started {run.job_run_id} with {run.executor_instances} executors"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Time-to-breakpoint harness for EMR on EKS and EMR Serverless.
+
+Submits the demo job to the virtual cluster from `EMRContainersStack` and the application from
+`EMRServerlessStack`, records when each job run state is first seen and reads the timing markers
+`debug_demo.py` prints on the driver. The result is a per-phase comparison report.
+
+    python -m emr_remote_debugging.tools.timing --debug-host ${DEBUG_IP}
+
+State transitions are observed by polling, so they are only as precise as `--poll-interval`.
+Markers come from the driver's clock.
+"""
+import argparse
+import gzip
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+MARKER_PREFIX = "DEBUG_TIMING"
+
+# Each phase is named after the event that ends it
+PHASE_NAMES = {
+    "state:PENDING": "job submission",
+    "state:SUBMITTED": "job submission",
+    "state:SCHEDULED": "scheduling",
+    "state:RUNNING": "scheduling / capacity",
+    "marker:script_start": "node provisioning, image pull, --archives unpack",
+    "marker:debugger_connect_start": "Python startup",
+    # settrace suspends the driver, so this includes the time until Resume is clicked
+    "marker:debugger_attached": "debugger connect, paused until Resume",
+    "marker:spark_session_ready": "Spark startup",
+    "state:COMPLETED": "job body",
+    "state:SUCCESS": "job body",
+    "state:FAILED": "job body",
+    "state:CANCELLED": "job body",
+}
+
+BREAKPOINT_EVENTS = ["marker:debugger_connect_start", "marker:spark_session_ready", "marker:script_start"]
+
+
+@dataclass
+class Event:
+    name: str
+    timestamp: float
+
+
+@dataclass
+class Timeline:
+    platform: str
+    job_run_id: str = ""
+    events: List[Event] = field(default_factory=list)
+    timed_out: bool = False
+
+    def add(self, name: str, timestamp: float) -> None:
+        # We only care about when something happened first
+        if not any(e.name == name for e in self.events):
+            self.events.append(Event(name, timestamp))
+
+    def sorted_events(self) -> List[Event]:
+        return sorted(self.events, key=lambda e: e.timestamp)
+
+    def phases(self) -> List[Tuple[str, float]]:
+        events = self.sorted_events()
+        phases: List[Tuple[str, float]] = []
+        for start, end in zip(events, events[1:]):
+            name = PHASE_NAMES.get(end.name, f"{start.name} -> {end.name}")
+            if phases and phases[-1][0] == name:
+                phases[-1] = (name, phases[-1][1] + end.timestamp - start.timestamp)
+            else:
+                phases.append((name, end.timestamp - start.timestamp))
+        return phases
+
+    def time_to_breakpoint(self) -> Optional[float]:
+        times = {e.name: e.timestamp for e in self.events}
+        if "submit" not in times:
+            return None
+        for name in BREAKPOINT_EVENTS:
+            if name in times:
+                return times[name] - times["submit"]
+        return None
+
+
+def parse_markers(stdout: str) -> List[Event]:
+    """
+    Driver markers look like `DEBUG_TIMING script_start 1706659200.123`.
+    """
+    events = []
+    for line in stdout.splitlines():
+        parts = line.strip().split()
+        if len(parts) == 3 and parts[0] == MARKER_PREFIX:
+            try:
+                events.append(Event(f"marker:{parts[1]}", float(parts[2])))
+            except ValueError:
+                continue
+    return events
+
+
+class EMRContainersRunner:
+    platform = "EMR on EKS"
+    terminal_states = {"COMPLETED", "FAILED", "CANCELLED"}
+
+    def __init__(self, client, virtual_cluster_id: str, job_role_arn: str, release_label: str, bucket: str):
+        self.client = client
+        self.virtual_cluster_id = virtual_cluster_id
+        self.job_role_arn = job_role_arn
+        self.release_label = release_label
+        self.bucket = bucket
+        self.log_uri = f"s3://{bucket}/logs/emr-eks/remote-debug"
+
+    def start(self, entry_point: str, spark_submit_parameters: str) -> str:
+        response = self.client.start_job_run(
+            name="remote-debug-timing",
+            virtualClusterId=self.virtual_cluster_id,
+            executionRoleArn=self.job_role_arn,
+            releaseLabel=self.release_label,
+            jobDriver={
+                "sparkSubmitJobDriver": {
+                    "entryPoint": entry_point,
+                    "sparkSubmitParameters": spark_submit_parameters,
+                }
+            },
+            configurationOverrides={
+                "monitoringConfiguration": {"s3MonitoringConfiguration": {"logUri": self.log_uri}},
+                "applicationConfiguration": [
+                    {
+                        "classification": "spark-defaults",
+                        "properties": {"spark.pyspark.python": "./environment/bin/python"},
+                    }
+                ],
+            },
+        )
+        return response["id"]
+
+    def state(self, job_run_id: str) -> str:
+        return self.client.describe_job_run(virtualClusterId=self.virtual_cluster_id, id=job_run_id)["jobRun"]["state"]
+
+    def cancel(self, job_run_id: str) -> None:
+        self.client.cancel_job_run(virtualClusterId=self.virtual_cluster_id, id=job_run_id)
+
+    def driver_env_conf(self, name: str, value: str) -> str:
+        return f"--conf spark.kubernetes.driverEnv.{name}={value}"
+
+    def driver_stdout_key(self, job_run_id: str) -> str:
+        prefix = self.log_uri.split("/", 3)[3]
+        return (
+            f"{prefix}/{self.virtual_cluster_id}/jobs/{job_run_id}/containers/"
+            f"spark-{job_run_id}/spark-{job_run_id}-driver/stdout.gz"
+        )
+
+
+class EMRServerlessRunner:
+    platform = "EMR Serverless"
+    terminal_states = {"SUCCESS", "FAILED", "CANCELLED"}
+
+    def __init__(self, client, application_id: str, job_role_arn: str, bucket: str):
+        self.client = client
+        self.application_id = application_id
+        self.job_role_arn = job_role_arn
+        self.bucket = bucket
+        self.log_uri = f"s3://{bucket}/logs/emr-serverless/"
+
+    def start(self, entry_point: str, spark_submit_parameters: str) -> str:
+        response = self.client.start_job_run(
+            name="remote-debug-timing",
+            applicationId=self.application_id,
+            executionRoleArn=self.job_role_arn,
+            jobDriver={
+                "sparkSubmit": {
+                    "entryPoint": entry_point,
+                    "sparkSubmitParameters": spark_submit_parameters,
+                }
+            },
+            configurationOverrides={
+                "monitoringConfiguration": {"s3MonitoringConfiguration": {"logUri": self.log_uri}},
+                "applicationConfiguration": [
+                    {
+                        "classification": "spark-defaults",
+                        "properties": {"spark.pyspark.python": "./environment/bin/python"},
+                    }
+                ],
+            },
+        )
+        return response["jobRunId"]
+
+    def state(self, job_run_id: str) -> str:
+        return self.client.get_job_run(applicationId=self.application_id, jobRunId=job_run_id)["jobRun"]["state"]
+
+    def cancel(self, job_run_id: str) -> None:
+        self.client.cancel_job_run(applicationId=self.application_id, jobRunId=job_run_id)
+
+    def driver_env_conf(self, name: str, value: str) -> str:
+        return f"--conf spark.emr-serverless.driverEnv.{name}={value}"
+
+    def driver_stdout_key(self, job_run_id: str) -> str:
+        return f"logs/emr-serverless/applications/{self.application_id}/jobs/{job_run_id}/SPARK_DRIVER/stdout.gz"
+
+
+def record(
+    runner,
+    entry_point: str,
+    spark_submit_parameters: str,
+    clock: Callable[[], float] = time.time,
+    sleep: Callable[[float], None] = time.sleep,
+    poll_interval: float = 2.0,
+    timeout: float = 1800,
+) -> Timeline:
+    """
+    Submit a job run and poll it until it finishes, recording when each state is first seen.
+    A run that is still going after `timeout` seconds is cancelled, e.g. a driver nobody resumed in the debugger,
+    so it doesn't keep holding capacity.
+    """
+    timeline = Timeline(runner.platform)
+    timeline.add("submit", clock())
+    timeline.job_run_id = runner.start(entry_point, spark_submit_parameters)
+
+    deadline = clock() + timeout
+    while True:
+        state = runner.state(timeline.job_run_id)
+        timeline.add(f"state:{state}", clock())
+        if state in runner.terminal_states:
+            return timeline
+        if clock() >= deadline:
+            runner.cancel(timeline.job_run_id)
+            timeline.timed_out = True
+            return timeline
+        sleep(poll_interval)
+
+
+def add_driver_markers(
+    timeline: Timeline,
+    s3,
+    runner,
+    sleep: Callable[[float], None] = time.sleep,
+    attempts: int = 12,
+) -> None:
+    """
+    Logs are shipped to S3 asynchronously, so the driver stdout may take a little while to appear.
+    """
+    key = runner.driver_stdout_key(timeline.job_run_id)
+    for attempt in range(attempts):
+        try:
+            body = s3.get_object(Bucket=runner.bucket, Key=key)["Body"].read()
+        except Exception:
+            if attempt == attempts - 1:
+                return
+            sleep(10)
+            continue
+        for event in parse_markers(gzip.decompress(body).decode("utf-8", errors="replace")):
+            timeline.add(event.name, event.timestamp)
+        return
+
+
+def report(timelines: List[Timeline]) -> str:
+    """
+    Render a plain-text table with one column per platform and one row per phase.
+    """
+    durations: List[Dict[str, float]] = [dict() for _ in timelines]
+    order: List[str] = []
+    for i, timeline in enumerate(timelines):
+        for name, seconds in timeline.phases():
+            durations[i][name] = durations[i].get(name, 0) + seconds
+            if name not in order:
+                order.append(name)
+
+    headers = ["phase"] + [_column_header(t) for t in timelines]
+    rows = [[name] + [_seconds(d.get(name)) for d in durations] for name in order]
+    rows.append(["time to breakpoint"] + [_seconds(t.time_to_breakpoint()) for t in timelines])
+
+    widths = [max(len(str(row[col])) for row in [headers] + rows) for col in range(len(headers))]
+    lines = [
+        "  ".join(h.ljust(w) for h, w in zip(headers, widths)),
+        "  ".join("-" * w for w in widths),
+    ]
+    for row in rows:
+        lines.append("  ".join([row[0].ljust(widths[0])] + [c.rjust(w) for c, w in zip(row[1:], widths[1:])]))
+    return "\n".join(lines)
+
+
+def _column_header(timeline: Timeline) -> str:
+    details = [d for d in [timeline.job_run_id, "timed out, cancelled" if timeline.timed_out else ""] if d]
+    return f"{timeline.platform} ({', '.join(details)})" if details else timeline.platform
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}s"
+
+
+def stack_outputs(cfn, stack_name: str) -> Dict[str, str]:
+    stack = cfn.describe_stacks(StackName=stack_name)["Stacks"][0]
+    return {o["OutputKey"]: o["OutputValue"] for o in stack.get("Outputs", [])}
+
+
+def main():
+    import boto3
+
+    parser = argparse.ArgumentParser(description="Compare time-to-breakpoint on EMR on EKS and EMR Serverless")
+    parser.add_argument("--region", default="us-west-2")
+    parser.add_argument("--release-label", default="emr-6.15.0-latest", help="EMR on EKS release label")
+    parser.add_argument("--debug-host", help="DevBox IP, so the debugger connect is timed as well")
+    parser.add_argument("--debug-port", default="3535")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=1800, help="cancel job runs still going after this long")
+    parser.add_argument("--skip-eks", action="store_true")
+    parser.add_argument("--skip-serverless", action="store_true")
+    args = parser.parse_args()
+
+    session = boto3.Session(region_name=args.region)
+    cfn = session.client("cloudformation")
+    s3 = session.client("s3")
+    bucket = stack_outputs(cfn, "VPCStack")["S3Bucket"]
+
+    runners = []
+    if not args.skip_eks:
+        outputs = stack_outputs(cfn, "EMRContainers")
+        runners.append(
+            EMRContainersRunner(
+                session.client("emr-containers"),
+                outputs["VirtualClusterID"],
+                outputs["JobRoleArn"],
+                args.release_label,
+                bucket,
+            )
+        )
+    if not args.skip_serverless:
+        outputs = stack_outputs(cfn, "EMRServerless")
+        runners.append(
+            EMRServerlessRunner(session.client("emr-serverless"), outputs["ApplicationID"], outputs["JobRoleArn"], bucket)
+        )
+
+    code = f"s3://{bucket}/code/remote-debugging"
+    timelines = []
+    for runner in runners:
+        params = f"--archives {code}/pyspark_deps.tar.gz#environment"
+        if args.debug_host:
+            params += " " + runner.driver_env_conf("DEBUG_HOST", args.debug_host)
+            params += " " + runner.driver_env_conf("DEBUG_PORT", args.debug_port)
+        timeline = record(
+            runner, f"{code}/debug_demo.py", params, poll_interval=args.poll_interval, timeout=args.timeout
+        )
+        add_driver_markers(timeline, s3, runner)
+        timelines.append(timeline)
+
+    print(report(timelines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The job code in demo_code isn't a package, it's shipped to EMR as plain modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "demo_code"))
+
+
+@pytest.fixture
+def synth():
+    """
+    Synthesize the EKS and EMR on EKS stacks with the given context and return their templates.
+    """
+    # Imported here so the tests that don't need CDK run without it
+    import aws_cdk as core
+    import aws_cdk.assertions as assertions
+
+    from emr_remote_debugging.stacks.eks import EKSStack
+    from emr_remote_debugging.stacks.emr_containers import EMRContainersStack
+    from emr_remote_debugging.stacks.vpc import VPCStack
+
+    def synth(context=None):
+        app = core.App(context=context or {})
+        vpc_stack = VPCStack(app, "VPCStack")
+        eks = EKSStack(app, "EKSStack", vpc_stack.emr_vpc)
+        emrc = EMRContainersStack(app, "EMRContainers", vpc_stack.emr_vpc, eks.cluster, vpc_stack.bucket)
+        return assertions.Template.from_stack(eks), assertions.Template.from_stack(emrc)
+
+    return synth
@@ -0,0 +1,127 @@
+import glob
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import capture  # noqa: E402
+
+
+def camel(location):
+    parts = location.split(",", 1)
+    return f"{parts[0].title()},{parts[1]}"
+
+
+def only_captures(root):
+    return sorted(os.path.dirname(p) for p in glob.glob(os.path.join(root, "*", "*", "input.parquet")))
+
+
+def test_udf_failure_is_captured_and_replayed(tmp_path):
+    wrapped = capture.capture_udf(camel, str(tmp_path), limit=2)
+    assert wrapped("seattle, WA US") == "Seattle, WA US"
+    assert wrapped("boeing field, WA US") == "Boeing Field, WA US"
+    with pytest.raises(IndexError):
+        wrapped("no comma")
+
+    [path] = only_captures(str(tmp_path))
+    meta, rows = capture.load_capture(path)
+
+    assert meta["capture.kind"] == "udf"
+    assert meta["capture.function"] == f"{__name__}:camel"
+    assert meta["capture.failed_index"] == "1"
+    assert "IndexError" in meta["capture.traceback"]
+    assert rows == [{"arg0": "boeing field, WA US"}, {"arg0": "no comma"}]
+
+    with pytest.raises(IndexError):
+        capture.replay(capture.resolve(meta["capture.function"]), meta, rows)
+
+
+def parse_lines(lines):
+    for line in lines:
+        yield int(line)
+
+
+def test_partition_values_replay_as_the_original_values(tmp_path):
+    wrapped = capture.capture_partitions(parse_lines, str(tmp_path))
+    with pytest.raises(ValueError):
+        list(wrapped(iter(["1", "2", "three", "4"])))
+
+    [path] = only_captures(str(tmp_path))
+    meta, rows = capture.load_capture(path)
+    seen = []
+
+    def record(items):
+        for item in items:
+            seen.append(item)
+            yield int(item)
+
+    with pytest.raises(ValueError):
+        capture.replay(record, meta, rows)
+    # Plain values come back as themselves, not wrapped in a row
+    assert seen == ["1", "2", "three"]
+
+
+def sum_pairs(pairs):
+    for a, b in pairs:
+        yield a + b
+
+
+def test_partition_tuples_replay_as_tuples(tmp_path):
+    wrapped = capture.capture_partitions(sum_pairs, str(tmp_path))
+    with pytest.raises(TypeError):
+        list(wrapped(iter([(1, 2), (3, None)])))
+
+    [path] = only_captures(str(tmp_path))
+    meta, rows = capture.load_capture(path)
+
+    items = []
+    capture.replay(lambda it: items.extend(it) or [], meta, rows)
+    assert items == [(1, 2), (3, None)]
+
+
+class Opaque:
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"Opaque({self.value})"
+
+
+def fail(value):
+    raise RuntimeError("boom")
+
+
+def test_repr_fallback_is_flagged(tmp_path, capsys):
+    wrapped = capture.capture_udf(fail, str(tmp_path))
+    with pytest.raises(RuntimeError):
+        wrapped(Opaque(1))
+
+    [path] = only_captures(str(tmp_path))
+    meta, rows = capture.load_capture(path)
+    assert meta["capture.repr_fallback"] == "true"
+    assert rows == [{"arg0": "Opaque(1)"}]
+
+    capture.replay(lambda value: value, meta, rows)
+    assert "repr()" in capsys.readouterr().err
+
+
+def test_main_module_functions_use_the_script_name(monkeypatch):
+    def job_fn():
+        pass
+
+    job_fn.__module__ = "__main__"
+    monkeypatch.setattr(capture.sys.modules["__main__"], "__file__", "/tmp/spark-1234/debug_demo.py", raising=False)
+
+    assert capture.function_spec(job_fn).startswith("debug_demo:")
+
+
+def test_relative_capture_uri(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    wrapped = capture.capture_udf(camel, "captures")
+    with pytest.raises(IndexError):
+        wrapped("no comma")
+
+    [path] = only_captures("captures")
+    meta, rows = capture.load_capture(path)
+    assert rows == [{"arg0": "no comma"}]
@@ -0,0 +1,58 @@
+import json
+
+from aws_cdk.assertions import Match
+
+
+def test_headroom_and_prepull_disabled_by_default(synth):
+    eks, _ = synth()
+    template = json.dumps(eks.to_json())
+
+    assert "PriorityClass" not in template
+    assert "emr-image-prepull" not in template
+
+
+def test_headroom_sized_from_context(synth):
+    eks, _ = synth({"spark_headroom_pods": "3", "spark_headroom_cpu": "4", "spark_headroom_memory": "16Gi"})
+
+    eks.has_resource_properties(
+        "Custom::AWSCDK-EKS-KubernetesResource",
+        {
+            "Manifest": Match.serialized_json(
+                Match.array_with(
+                    [
+                        Match.object_like({"kind": "PriorityClass", "metadata": {"name": "headroom"}}),
+                        Match.object_like(
+                            {
+                                "kind": "Deployment",
+                                "spec": {
+                                    "replicas": 3,
+                                    "template": {
+                                        "spec": {
+                                            "priorityClassName": "headroom",
+                                            "containers": [
+                                                {"resources": {"requests": {"cpu": "4", "memory": "16Gi"}}}
+                                            ],
+                                        }
+                                    },
+                                },
+                            }
+                        ),
+                    ]
+                )
+            )
+        },
+    )
+
+
+def test_prepull_uses_release_label(synth):
+    eks, _ = synth({"emr_image_prepull": True, "emr_release_label": "emr-6.14.0"})
+
+    eks.has_mapping("EMRImageAccounts", {"us-west-2": {"account": "895885662937"}})
+    assert "spark/emr-6.14.0:latest" in json.dumps(eks.to_json())
+
+
+def test_prepull_disabled_from_command_line(synth):
+    # --context values are always strings
+    eks, _ = synth({"emr_image_prepull": "false"})
+
+    assert "emr-image-prepull" not in json.dumps(eks.to_json())
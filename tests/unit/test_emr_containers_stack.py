@@ -0,0 +1,52 @@
+import json
+
+
+def test_managed_endpoint_disabled_by_default(synth):
+    eks, emrc = synth()
+
+    emrc.resource_count_is("Custom::AWS", 0)
+    assert "aws-load-balancer-controller" not in json.dumps(eks.to_json())
+
+
+def test_managed_endpoint_created_with_idle_timeout(synth):
+    eks, emrc = synth({"emr_managed_endpoint": True, "emr_endpoint_idle_timeout_minutes": 30})
+
+    emrc.resource_count_is("Custom::AWS", 1)
+    emrc.has_output("ManagedEndpointID", {})
+    endpoint = json.dumps(emrc.find_resources("Custom::AWS"))
+    assert "createManagedEndpoint" in endpoint
+    assert "deleteManagedEndpoint" in endpoint
+    assert "JUPYTER_ENTERPRISE_GATEWAY" in endpoint
+    assert "KernelManager.cull_idle_timeout" in endpoint
+    assert "1800" in endpoint
+    assert "iam:PassRole" in json.dumps(emrc.find_resources("AWS::IAM::Policy"))
+
+
+def test_managed_endpoint_context_from_command_line(synth):
+    # --context values are always strings
+    _, emrc = synth({"emr_managed_endpoint": "false"})
+    emrc.resource_count_is("Custom::AWS", 0)
+
+    _, emrc = synth(
+        {"emr_managed_endpoint": "true", "emr_endpoint_idle_timeout_minutes": "30", "emr_release_label": "emr-7.0.0"}
+    )
+    endpoint = json.dumps(emrc.find_resources("Custom::AWS"))
+    assert "1800" in endpoint
+    assert "emr-7.0.0-latest" in endpoint
+    # The endpoint is replaced rather than left as is when its config changes
+    assert endpoint.count("createManagedEndpoint") == 2
+
+
+def test_load_balancer_controller_resources(synth):
+    eks, _ = synth({"emr_managed_endpoint": True})
+
+    eks.has_resource_properties(
+        "Custom::AWSCDK-EKS-HelmChart",
+        {
+            "Chart": "aws-load-balancer-controller",
+            "Namespace": "kube-system",
+            "Repository": "https://aws.github.io/eks-charts",
+        },
+    )
+    assert "elasticloadbalancing:CreateLoadBalancer" in json.dumps(eks.find_resources("AWS::IAM::Policy"))
+    assert "studio-aws-load-balancer-controller" in json.dumps(eks.to_json())
@@ -0,0 +1,115 @@
+import io
+import os
+import zipfile
+
+from emr_remote_debugging.tools.package import build_zip, collect_files, package
+
+
+class LocalS3:
+    """
+    In-memory stand-in for the two S3 calls the packaging tool makes.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = []
+
+    def list_objects_v2(self, Bucket, Prefix, MaxKeys=1000):
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))[:MaxKeys]
+        return {"KeyCount": len(keys), "Contents": [{"Key": k} for k in keys]} if keys else {"KeyCount": 0}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+        self.puts.append(Key)
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def make_project(root):
+    write(os.path.join(root, "jobs", "__init__.py"), "")
+    write(os.path.join(root, "jobs", "transforms.py"), "def camel(x):\n    return x\n")
+    write(os.path.join(root, "jobs", "main.py"), "import jobs.transforms\n")
+    write(os.path.join(root, "jobs", "__pycache__", "transforms.cpython-311.pyc"), "junk")
+    write(os.path.join(root, "jobs", ".hidden"), "junk")
+    return os.path.join(root, "jobs")
+
+
+def test_package_directory_keeps_its_name(tmp_path):
+    source = make_project(str(tmp_path))
+
+    names = [arcname for _, arcname in collect_files(source)]
+
+    assert names == ["jobs/__init__.py", "jobs/main.py", "jobs/transforms.py"]
+
+
+def test_plain_directory_is_flattened(tmp_path):
+    write(str(tmp_path / "code" / "debug_demo.py"), "")
+    write(str(tmp_path / "code" / "capture.py"), "")
+    write(str(tmp_path / "code" / "README.md"), "")
+    write(str(tmp_path / "code" / "pydevd_plugins" / "extensions" / "plugin.py"), "")
+
+    names = [
+        arcname
+        for _, arcname in collect_files(str(tmp_path / "code"), exclude=["debug_demo.py", "pydevd_plugins"])
+    ]
+
+    assert names == ["capture.py"]
+
+
+def test_zip_is_deterministic(tmp_path):
+    source = make_project(str(tmp_path))
+    first = build_zip(source)
+
+    # Touching files and changing permissions doesn't change the zip
+    path = os.path.join(source, "transforms.py")
+    os.utime(path, (1_000_000_000, 1_000_000_000))
+    os.chmod(path, 0o755)
+    assert build_zip(source) == first
+
+    with zipfile.ZipFile(io.BytesIO(first)) as zf:
+        assert zf.read("jobs/transforms.py").startswith(b"def camel")
+
+    write(path, "def camel(x):\n    return x.title()\n")
+    assert build_zip(source) != first
+
+
+def test_upload_skipped_when_hash_exists(tmp_path):
+    source = make_project(str(tmp_path))
+    s3 = LocalS3()
+
+    first = package(s3, "bucket", source, archives="s3://bucket/deps.tar.gz#environment")
+    second = package(s3, "bucket", source, archives="s3://bucket/deps.tar.gz#environment")
+
+    assert len(first["uploaded"]) == 1
+    assert second["uploaded"] == []
+    assert len(s3.puts) == 1
+    assert first["sparkSubmitParameters"] == second["sparkSubmitParameters"]
+
+    key = first["uploaded"][0]
+    assert key.startswith("code/remote-debugging/cas/") and key.endswith("/jobs.zip")
+    assert first["sparkSubmitParameters"] == (
+        f"--archives s3://bucket/deps.tar.gz#environment --py-files s3://bucket/{key}"
+    )
+
+
+def test_entry_point_uploaded_separately(tmp_path):
+    write(str(tmp_path / "code" / "debug_demo.py"), "print('hi')\n")
+    write(str(tmp_path / "code" / "capture.py"), "")
+    s3 = LocalS3()
+
+    result = package(s3, "bucket", str(tmp_path / "code"), entry_point=str(tmp_path / "code" / "debug_demo.py"))
+
+    assert result["entryPoint"].endswith("/debug_demo.py")
+    assert len(result["uploaded"]) == 2
+    zip_body = s3.objects[("bucket", result["uploaded"][0])]
+    with zipfile.ZipFile(io.BytesIO(zip_body)) as zf:
+        assert zf.namelist() == ["capture.py"]
+
+    # Changing only the entry point re-uploads only the entry point
+    write(str(tmp_path / "code" / "debug_demo.py"), "print('bye')\n")
+    again = package(s3, "bucket", str(tmp_path / "code"), entry_point=str(tmp_path / "code" / "debug_demo.py"))
+    assert again["uploaded"] == [again["entryPoint"].split("s3://bucket/")[1]]
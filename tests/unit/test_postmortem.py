@@ -0,0 +1,113 @@
+import os
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import postmortem  # noqa: E402
+
+
+def raise_from_job(fn):
+    camelize = fn  # noqa: F841 - a local that points at something in __main__
+    raise IndexError("list index out of range")
+
+
+def dump_exception(uri, fn):
+    try:
+        raise_from_job(fn)
+    except IndexError:
+        postmortem._dump(uri, *sys.exc_info())
+    [name] = os.listdir(uri)
+    return os.path.join(uri, name)
+
+
+def test_dump_with_main_references_loads_back(tmp_path, monkeypatch):
+    def convert_to_camel_case(location):
+        return location
+
+    # Pretend this was defined in the job script, like debug_demo.convert_to_camel_case under spark-submit
+    convert_to_camel_case.__module__ = "__main__"
+    convert_to_camel_case.__qualname__ = "convert_to_camel_case"
+    monkeypatch.setattr(sys.modules["__main__"], "convert_to_camel_case", convert_to_camel_case, raising=False)
+    path = dump_exception(str(tmp_path), convert_to_camel_case)
+    monkeypatch.delattr(sys.modules["__main__"], "convert_to_camel_case")
+
+    dump = postmortem.load(path)
+
+    assert dump["exception"] == "IndexError: list index out of range"
+    frame = next(f for f in dump["frames"] if f["function"] == "raise_from_job")
+    assert "__main__.convert_to_camel_case" in repr(frame["locals"]["camelize"])
+
+
+class FakePyDB:
+    """
+    Stands in for pydevd's global debugger. It only stops when the IDE sent a breakpoint for unhandled exceptions.
+    """
+
+    def __init__(self, break_on_unhandled):
+        self.break_on_unhandled = break_on_unhandled
+        self.stopped_on = None
+
+    def set_additional_thread_info(self, thread):
+        return types.SimpleNamespace(is_tracing=0)
+
+    def stop_on_unhandled_exception(self, py_db, thread, additional_info, arg):
+        if self.break_on_unhandled:
+            self.do_wait_suspend(thread, None, "exception", arg)
+
+    def do_wait_suspend(self, thread, frame, event, arg):
+        self.stopped_on = arg[0]
+
+
+def fake_pydevd(monkeypatch, py_db=None, connect_error=None):
+    def settrace(host, port, **kwargs):
+        if connect_error:
+            raise connect_error
+
+    # Keeps the timeout _post_mortem sets from leaking into other tests
+    monkeypatch.setenv("PYDEVD_CONNECT_TIMEOUT", str(postmortem.CONNECT_TIMEOUT))
+    pydevd = types.SimpleNamespace(get_global_debugger=lambda: py_db, stoptrace=lambda: None)
+    monkeypatch.setitem(sys.modules, "pydevd", pydevd)
+    monkeypatch.setitem(sys.modules, "pydevd_pycharm", types.SimpleNamespace(settrace=settrace))
+
+
+def handle_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(postmortem, "_config", {"host": "devbox", "port": 3535, "dump_uri": str(tmp_path)})
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        postmortem.handle(*sys.exc_info())
+    return os.listdir(str(tmp_path))
+
+
+def test_failed_connect_falls_back_to_dump(tmp_path, monkeypatch):
+    fake_pydevd(monkeypatch, connect_error=ConnectionRefusedError("debug server busy"))
+
+    [name] = handle_error(monkeypatch, tmp_path)
+    assert postmortem.load(os.path.join(str(tmp_path), name))["exception"] == "ValueError: bad row"
+
+
+def test_dumps_when_the_debugger_does_not_stop(tmp_path, monkeypatch):
+    py_db = FakePyDB(break_on_unhandled=False)
+    fake_pydevd(monkeypatch, py_db)
+
+    assert len(handle_error(monkeypatch, tmp_path)) == 1
+    assert "do_wait_suspend" not in vars(py_db)
+
+
+def test_no_dump_when_the_debugger_stops(tmp_path, monkeypatch):
+    py_db = FakePyDB(break_on_unhandled=True)
+    fake_pydevd(monkeypatch, py_db)
+
+    assert handle_error(monkeypatch, tmp_path) == []
+    assert py_db.stopped_on is ValueError
+
+
+def test_relative_dump_uri(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = dump_exception("dumps", None)
+
+    assert not os.path.isabs(path)
+    assert postmortem.load(path)["exception"] == "IndexError: list index out of range"
@@ -0,0 +1,139 @@
+import importlib.util
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("_pydevd_bundle")
+
+PLUGIN = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "..",
+    "demo_code",
+    "pydevd_plugins",
+    "extensions",
+    "types",
+    "pydevd_plugin_pyspark_types.py",
+)
+# Loaded from its file, pydevd has its own pydevd_plugins package
+spec = importlib.util.spec_from_file_location("pydevd_plugin_pyspark_types", PLUGIN)
+plugin = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(plugin)
+
+
+class FakeSparkContext:
+    def __init__(self):
+        self.groups = []
+        self.cancelled = []
+
+    def setJobGroup(self, group, description, interruptOnCancel=False):
+        self.groups.append(group)
+
+    def cancelJobGroup(self, group):
+        self.cancelled.append(group)
+
+
+class FakeDataFrame:
+    def __init__(self, rows, sc=None, block=None):
+        self.rows = rows
+        self.sparkSession = SimpleNamespace(sparkContext=sc or FakeSparkContext())
+        self.block = block
+        self.collects = 0
+        self.columns = ["STATION", "NAME"]
+        self.is_cached = False
+        self.plans = 0
+        self._jdf = SimpleNamespace(
+            schema=lambda: SimpleNamespace(treeString=lambda: "root\n |-- STATION: long"),
+            queryExecution=self._query_execution,
+        )
+
+    def _query_execution(self):
+        self.plans += 1
+        return SimpleNamespace(optimizedPlan=lambda: SimpleNamespace(toString=lambda: "LocalRelation"))
+
+    def _derive(self, rows):
+        derived = FakeDataFrame(rows, self.sparkSession.sparkContext, self.block)
+        derived.parent = self
+        return derived
+
+    def limit(self, n):
+        return self._derive(self.rows[:n])
+
+    def offset(self, n):
+        return self._derive(self.rows[n:])
+
+    def collect(self):
+        if self.block:
+            self.block.wait()
+        parent = getattr(self, "parent", None)
+        while parent is not None:
+            parent.collects += 1
+            parent = getattr(parent, "parent", None)
+        return list(self.rows)
+
+
+def test_collect_with_timeout_cancels_the_job_group():
+    release = threading.Event()
+    df = FakeDataFrame([1, 2, 3], block=release)
+    sc = df.sparkSession.sparkContext
+    try:
+        with pytest.raises(TimeoutError):
+            plugin.collect_with_timeout(df, timeout=0.05)
+    finally:
+        release.set()
+
+    assert sc.cancelled == sc.groups
+    assert len(sc.cancelled) == 1
+
+
+def test_collect_with_timeout_reraises_job_errors():
+    df = FakeDataFrame([])
+    df.collect = lambda: (_ for _ in ()).throw(ValueError("AnalysisException"))
+
+    with pytest.raises(ValueError, match="AnalysisException"):
+        plugin.collect_with_timeout(df, timeout=1)
+
+
+def test_preview_is_cached_per_dataframe():
+    df = FakeDataFrame(list(range(100)))
+
+    assert plugin.preview(df, rows=5) == [0, 1, 2, 3, 4]
+    assert plugin.preview(df, rows=5) == [0, 1, 2, 3, 4]
+    assert df.collects == 1
+    assert plugin.preview(df, rows=3) == [0, 1, 2]
+    assert df.collects == 2
+    assert plugin.preview(FakeDataFrame(list(range(100))), rows=5) == [0, 1, 2, 3, 4]
+
+
+def test_page_offsets():
+    df = FakeDataFrame(list(range(45)))
+
+    assert plugin.page(df, 0, size=20) == list(range(20))
+    assert plugin.page(df, 2, size=20) == list(range(40, 45))
+    assert plugin.page(df, 3, size=20) == []
+
+
+def test_is_dataframe_checks_module_and_name():
+    pyspark_dataframe = type("DataFrame", (), {"__module__": "pyspark.sql.dataframe"})
+    pandas_dataframe = type("DataFrame", (), {"__module__": "pandas.core.frame"})
+
+    assert plugin._is_dataframe(pyspark_dataframe, "DataFrame")
+    assert not plugin._is_dataframe(pandas_dataframe, "DataFrame")
+    assert not plugin._is_dataframe(pyspark_dataframe, "Row")
+
+
+def test_resolve_only_computes_the_requested_attribute():
+    df = FakeDataFrame(list(range(100)))
+    provider = plugin.DataFrameResolveProvider()
+
+    assert provider.resolve(df, "columns") == ["STATION", "NAME"]
+    assert provider.resolve(df, "missing") is None
+    assert df.plans == 0
+    assert df.collects == 0
+
+    values = provider.get_dictionary(df)
+    assert list(values) == list(plugin.ATTRIBUTES)
+    assert values["plan"] == "LocalRelation"
+    assert df.plans == 1
@@ -0,0 +1,168 @@
+import pytest
+
+from emr_remote_debugging.tools.scheduler import USER_TAG, DebugRun, WarmCapacityScheduler
+
+
+class FakeServerlessClient:
+    """
+    Just enough of the EMR Serverless API to track job runs on a single application.
+    """
+
+    def __init__(self, drivers=2, executors=10, state="STARTED"):
+        self.state = state
+        self.initial_capacity = {
+            "Driver": {"workerCount": drivers},
+            "Executor": {"workerCount": executors},
+        }
+        self.job_runs = {}
+        self.started = []
+
+    def get_application(self, applicationId):
+        return {"application": {"state": self.state, "initialCapacity": self.initial_capacity}}
+
+    def start_application(self, applicationId):
+        self.state = "STARTING"
+
+    def list_job_runs(self, applicationId, states, nextToken=None):
+        runs = [{"id": run_id} for run_id, run in self.job_runs.items() if run["state"] in states]
+        # Page one run at a time to exercise pagination
+        start = int(nextToken or 0)
+        response = {"jobRuns": runs[start : start + 1]}
+        if start + 1 < len(runs):
+            response["nextToken"] = str(start + 1)
+        return response
+
+    def get_job_run(self, applicationId, jobRunId):
+        return {"jobRun": self.job_runs[jobRunId]}
+
+    def start_job_run(self, **kwargs):
+        run_id = f"run-{len(self.job_runs) + 1}"
+        self.job_runs[run_id] = {"state": "SUBMITTED", "jobDriver": kwargs["jobDriver"], "tags": kwargs.get("tags", {})}
+        self.started.append(kwargs)
+        return {"jobRunId": run_id}
+
+    def finish(self, run_id):
+        self.job_runs[run_id]["state"] = "SUCCESS"
+
+
+def make_run(user, executors=4, **kwargs):
+    return DebugRun(user=user, entry_point="s3://bucket/debug_demo.py", executors=executors, **kwargs)
+
+
+def test_sizes_executors_to_free_warm_workers():
+    client = FakeServerlessClient(drivers=2, executors=10)
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_per_user=None)
+    scheduler.submit(make_run("alice", executors=8))
+    scheduler.submit(make_run("bob", executors=8))
+
+    admitted = scheduler.poll()
+
+    assert [(r.user, r.executor_instances) for r in admitted] == [("alice", 8), ("bob", 2)]
+    params = client.started[1]["jobDriver"]["sparkSubmit"]["sparkSubmitParameters"]
+    assert "--conf spark.executor.instances=2" in params
+    assert "--conf spark.dynamicAllocation.enabled=false" in params
+    assert client.started[1]["tags"] == {USER_TAG: "bob"}
+
+
+def test_queues_until_a_warm_driver_is_free():
+    client = FakeServerlessClient(drivers=1, executors=10)
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_per_user=None)
+    scheduler.submit(make_run("alice"))
+    scheduler.submit(make_run("bob"))
+
+    first = scheduler.poll()
+    assert [r.user for r in first] == ["alice"]
+    assert scheduler.poll() == []
+    assert scheduler.pending() == 1
+
+    client.finish(first[0].job_run_id)
+    assert [r.user for r in scheduler.poll()] == ["bob"]
+    assert scheduler.pending() == 0
+
+
+def test_waits_for_minimum_executors():
+    client = FakeServerlessClient(drivers=2, executors=4)
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_per_user=None)
+    scheduler.submit(make_run("alice", executors=4))
+    scheduler.submit(make_run("bob", executors=4, min_executors=2))
+
+    assert [r.user for r in scheduler.poll()] == ["alice"]
+    assert scheduler.pending() == 1
+
+
+def test_round_robin_between_users():
+    client = FakeServerlessClient(drivers=4, executors=40)
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_per_user=None)
+    for _ in range(3):
+        scheduler.submit(make_run("alice", executors=1))
+    scheduler.submit(make_run("bob", executors=1))
+
+    assert [r.user for r in scheduler.poll()] == ["alice", "bob", "alice", "alice"]
+
+
+def test_max_per_user_counts_runs_from_other_schedulers():
+    client = FakeServerlessClient(drivers=4, executors=40)
+    other = WarmCapacityScheduler(client, "app", "arn:role")
+    other.submit(make_run("alice", executors=1))
+    other.poll()
+
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_per_user=1)
+    scheduler.submit(make_run("alice", executors=1))
+    scheduler.submit(make_run("bob", executors=1))
+
+    assert [r.user for r in scheduler.poll()] == ["bob"]
+    assert scheduler.pending() == 1
+
+
+def test_max_concurrent_and_unmanaged_runs():
+    client = FakeServerlessClient(drivers=3, executors=10)
+    client.job_runs["manual"] = {"state": "RUNNING", "jobDriver": {"sparkSubmit": {"entryPoint": "x"}}}
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_concurrent=2, max_per_user=None)
+    scheduler.submit(make_run("alice", executors=10))
+    scheduler.submit(make_run("bob", executors=10))
+
+    # The unmanaged run takes a driver and the default 3 executors
+    admitted = scheduler.poll()
+    assert [(r.user, r.executor_instances) for r in admitted] == [("alice", 7)]
+
+
+def test_starts_stopped_application_and_waits():
+    client = FakeServerlessClient(drivers=1, executors=10, state="STOPPED")
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_per_user=None)
+    scheduler.submit(make_run("alice"))
+    scheduler.submit(make_run("bob"))
+    started = []
+
+    def sleep(seconds):
+        # Finish whatever is running while we wait
+        for run in started:
+            client.finish(run.job_run_id)
+
+    scheduler.wait(sleep=sleep, interval=0, on_admit=started.append)
+
+    assert client.state == "STARTING"
+    assert [r.user for r in started] == ["alice", "bob"]
+
+
+def test_rejects_runs_that_can_never_fit():
+    scheduler = WarmCapacityScheduler(FakeServerlessClient(drivers=2, executors=4), "app", "arn:role")
+    with pytest.raises(ValueError, match="min_executors=5"):
+        scheduler.submit(make_run("alice", min_executors=5))
+
+    scheduler = WarmCapacityScheduler(FakeServerlessClient(drivers=0, executors=4), "app", "arn:role")
+    with pytest.raises(ValueError, match="no warm drivers"):
+        scheduler.submit(make_run("alice"))
+
+    scheduler = WarmCapacityScheduler(FakeServerlessClient(), "app", "arn:role", max_per_user=0)
+    with pytest.raises(ValueError, match="max_per_user=0"):
+        scheduler.submit(make_run("alice"))
+    assert scheduler.pending() == 0
+
+
+def test_usage_reads_the_executor_count_spark_uses():
+    client = FakeServerlessClient(drivers=2, executors=10)
+    scheduler = WarmCapacityScheduler(client, "app", "arn:role", max_per_user=None)
+    scheduler.submit(make_run("alice", executors=10, spark_submit_parameters="--conf spark.executor.instances=1"))
+    scheduler.poll()
+
+    assert scheduler.usage().executors == 10
@@ -0,0 +1,212 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+import stage_cache  # noqa: E402
+
+DAY = 24 * 60 * 60
+
+
+class FakeClock:
+    def __init__(self, now=100 * DAY):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class FakeStatus:
+    def __init__(self, path, is_dir, length=0, modified=0.0):
+        self.path = path
+        self.is_dir = is_dir
+        self.length = length
+        self.modified = modified
+
+    def getPath(self):
+        return FakePath(self.path)
+
+    def isDirectory(self):
+        return self.is_dir
+
+    def getLen(self):
+        return self.length
+
+    def getModificationTime(self):
+        return int(self.modified * 1000)
+
+
+class FakeFileSystem:
+    """
+    Just enough of a Hadoop FileSystem, files are kept as {path: (length, modification time in seconds)}.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.files = {}
+
+    def put(self, path, length=1, modified=None):
+        self.files[path] = (length, self.clock.now if modified is None else modified)
+
+    def exists(self, path):
+        return str(path) in self.files or any(f.startswith(f"{path}/") for f in self.files)
+
+    def getFileStatus(self, path):
+        if str(path) not in self.files:
+            raise FileNotFoundError(str(path))
+        length, modified = self.files[str(path)]
+        return FakeStatus(str(path), False, length, modified)
+
+    def listStatus(self, path):
+        children = {}
+        for f in self.files:
+            if f.startswith(f"{path}/"):
+                name, _, rest = f[len(str(path)) + 1 :].partition("/")
+                children[name] = bool(rest)
+        return [FakeStatus(f"{path}/{name}", is_dir) for name, is_dir in sorted(children.items())]
+
+
+class FakePath(str):
+    fs = None
+
+    def getName(self):
+        return self.rsplit("/", 1)[-1]
+
+    def getFileSystem(self, conf):
+        return self.fs
+
+
+class FakeFrame:
+    def __init__(self, spark, source):
+        self.spark = spark
+        self.source = source
+
+    @property
+    def write(self):
+        return self
+
+    def mode(self, mode):
+        return self
+
+    def parquet(self, path):
+        self.spark.fs.put(f"{path}/part-00000.parquet")
+        self.spark.fs.put(f"{path}/_SUCCESS")
+
+
+class FakeSpark:
+    def __init__(self, clock):
+        self.fs = FakeFileSystem(clock)
+        path = type("Path", (FakePath,), {"fs": self.fs})
+        hadoop = SimpleNamespace(fs=SimpleNamespace(Path=path))
+        self.sparkContext = SimpleNamespace(
+            _jvm=SimpleNamespace(org=SimpleNamespace(apache=SimpleNamespace(hadoop=hadoop))),
+            _jsc=SimpleNamespace(hadoopConfiguration=lambda: None),
+        )
+        self.read = SimpleNamespace(parquet=lambda path: FakeFrame(self, path))
+
+
+class NoSuchLifecycleConfiguration(Exception):
+    response = {"Error": {"Code": "NoSuchLifecycleConfiguration"}}
+
+
+class FakeS3:
+    exceptions = SimpleNamespace(ClientError=NoSuchLifecycleConfiguration)
+
+    def __init__(self, rules=None):
+        self.rules = rules
+
+    def get_bucket_lifecycle_configuration(self, Bucket):
+        if self.rules is None:
+            raise NoSuchLifecycleConfiguration()
+        return {"Rules": self.rules}
+
+
+def expire_after(days, prefix="cache/"):
+    rule = {"ID": "StageCache", "Filter": {"Prefix": prefix}, "Status": "Enabled", "Expiration": {"Days": days}}
+    return FakeS3([rule])
+
+
+def readings(ss, years):
+    return FakeFrame(ss, f"readings {years}")
+
+
+def other_readings(ss, years):
+    return FakeFrame(ss, f"other readings {years}")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(stage_cache, "time", clock)
+    return clock
+
+
+def test_cache_key_changes_with_source_params_and_inputs(clock):
+    ss = FakeSpark(clock)
+    ss.fs.put("s3://noaa/2022.csv", length=100)
+    key = stage_cache.cache_key(ss, readings, {"years": [2022]}, ["s3://noaa/2022.csv"])
+
+    assert stage_cache.cache_key(ss, readings, {"years": [2022]}, ["s3://noaa/2022.csv"]) == key
+    assert stage_cache.cache_key(ss, other_readings, {"years": [2022]}, ["s3://noaa/2022.csv"]) != key
+    assert stage_cache.cache_key(ss, readings, {"years": [2023]}, ["s3://noaa/2022.csv"]) != key
+    assert stage_cache.cache_key(ss, readings, {"years": [2022]}, ["s3://noaa/2022.csv"], [other_readings]) != key
+    ss.fs.put("s3://noaa/2022.csv", length=101)
+    assert stage_cache.cache_key(ss, readings, {"years": [2022]}, ["s3://noaa/2022.csv"]) != key
+
+
+def test_latest_generation_is_the_newest_complete_one(clock):
+    ss = FakeSpark(clock)
+    entry = "s3://bucket/cache/readings/key"
+    ss.fs.put(f"{entry}/100/_SUCCESS", modified=clock.now - 3 * DAY)
+    ss.fs.put(f"{entry}/200/_SUCCESS", modified=clock.now - DAY)
+    # Still being written
+    ss.fs.put(f"{entry}/300/part-00000.parquet")
+
+    assert stage_cache._latest_generation(ss, entry) == (f"{entry}/200", DAY)
+    assert stage_cache._latest_generation(ss, "s3://bucket/cache/readings/missing") == (None, 0.0)
+
+
+def test_miss_then_hit_then_rewrite_at_half_ttl(clock):
+    ss = FakeSpark(clock)
+    s3 = expire_after(8)
+
+    first = stage_cache.cached_stage(ss, "s3://bucket/cache", readings, {"years": [2022]}, s3=s3)
+    generations = {f.rsplit("/", 2)[-2] for f in ss.fs.files}
+    assert len(generations) == 1
+
+    clock.now += DAY
+    assert stage_cache.cached_stage(ss, "s3://bucket/cache", readings, {"years": [2022]}, s3=s3).source == first.source
+
+    clock.now += 4 * DAY
+    rewritten = stage_cache.cached_stage(ss, "s3://bucket/cache", readings, {"years": [2022]}, s3=s3)
+    assert rewritten.source != first.source
+    assert rewritten.source.endswith(f"/{int(clock.now)}")
+
+
+def test_entries_close_to_expiry_are_recomputed(clock):
+    ss = FakeSpark(clock)
+    s3 = expire_after(3)
+    first = stage_cache.cached_stage(ss, "s3://bucket/cache", readings, {"years": [2022]}, s3=s3)
+
+    # S3 may already have deleted some of the part files
+    clock.now += 2 * DAY + 1
+    again = stage_cache.cached_stage(ss, "s3://bucket/cache", readings, {"years": [2022]}, s3=s3)
+    assert again.source != first.source
+
+
+def test_ttl_comes_from_the_lifecycle_rule():
+    assert stage_cache.lifecycle_ttl_days(expire_after(7), "s3://bucket/cache") == 7
+    assert stage_cache.lifecycle_ttl_days(expire_after(7), "s3a://bucket/cache/") == 7
+    assert stage_cache.lifecycle_ttl_days(expire_after(7, prefix="logs/"), "s3://bucket/cache") is None
+    assert stage_cache.lifecycle_ttl_days(FakeS3(), "s3://bucket/cache") is None
+    assert stage_cache.lifecycle_ttl_days(None, "/tmp/cache") is None
+    legacy = FakeS3([{"Prefix": "", "Status": "Enabled", "Expiration": {"Days": 30}}, expire_after(5).rules[0]])
+    assert stage_cache.lifecycle_ttl_days(legacy, "s3://bucket/cache") == 5
+    tagged = FakeS3([{"Filter": {"Tag": {"Key": "tmp", "Value": "1"}}, "Status": "Enabled", "Expiration": {"Days": 1}}])
+    assert stage_cache.lifecycle_ttl_days(tagged, "s3://bucket/cache") is None
+
+
+def test_rejects_ttl_shorter_than_the_expiry_margin(clock):
+    with pytest.raises(ValueError, match="after 1 day"):
+        stage_cache.cached_stage(FakeSpark(clock), "s3://bucket/cache", readings, s3=expire_after(1))
@@ -0,0 +1,215 @@
+import gzip
+import io
+
+from emr_remote_debugging.tools.timing import (
+    EMRContainersRunner,
+    EMRServerlessRunner,
+    Timeline,
+    add_driver_markers,
+    parse_markers,
+    record,
+    report,
+)
+
+DRIVER_STDOUT = """=== ENABLING DEBUG MODE ===
+DEBUG_TIMING script_start 1100.0
+DEBUG_TIMING debugger_connect_start 1100.5
+DEBUG_TIMING debugger_attached 1102.5
+DEBUG_TIMING spark_session_ready 1110.0
+214 records for 2023
+"""
+
+
+class FakeClock:
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeContainersClient:
+    def __init__(self, states):
+        self.states = list(states)
+        self.started = None
+        self.cancelled = None
+
+    def start_job_run(self, **kwargs):
+        self.started = kwargs
+        return {"id": "job-1"}
+
+    def describe_job_run(self, virtualClusterId, id):
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return {"jobRun": {"state": state}}
+
+    def cancel_job_run(self, virtualClusterId, id):
+        self.cancelled = id
+
+
+class FakeServerlessClient:
+    def __init__(self, states):
+        self.states = list(states)
+        self.cancelled = None
+
+    def start_job_run(self, **kwargs):
+        return {"jobRunId": "run-1"}
+
+    def get_job_run(self, applicationId, jobRunId):
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return {"jobRun": {"state": state}}
+
+    def cancel_job_run(self, applicationId, jobRunId):
+        self.cancelled = jobRunId
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+
+def test_parse_markers_ignores_other_output():
+    events = parse_markers(DRIVER_STDOUT + "DEBUG_TIMING broken line here\n")
+    assert [e.name for e in events] == [
+        "marker:script_start",
+        "marker:debugger_connect_start",
+        "marker:debugger_attached",
+        "marker:spark_session_ready",
+    ]
+    assert events[2].timestamp == 1102.5
+
+
+def test_record_containers_job_run():
+    clock = FakeClock()
+    client = FakeContainersClient(["PENDING", "SUBMITTED", "SUBMITTED", "RUNNING", "COMPLETED"])
+    runner = EMRContainersRunner(client, "vc-1", "arn:role", "emr-6.15.0-latest", "bucket")
+
+    timeline = record(runner, "s3://bucket/debug_demo.py", "", clock=clock, sleep=clock.sleep, poll_interval=5)
+
+    assert timeline.job_run_id == "job-1"
+    assert client.started["virtualClusterId"] == "vc-1"
+    assert [(e.name, e.timestamp) for e in timeline.events] == [
+        ("submit", 1000.0),
+        ("state:PENDING", 1000.0),
+        ("state:SUBMITTED", 1005.0),
+        ("state:RUNNING", 1015.0),
+        ("state:COMPLETED", 1020.0),
+    ]
+
+
+def test_record_cancels_at_timeout():
+    clock = FakeClock()
+    client = FakeServerlessClient(["PENDING"])
+    runner = EMRServerlessRunner(client, "app-1", "arn:role", "bucket")
+
+    timeline = record(runner, "s3://x", "", clock=clock, sleep=clock.sleep, poll_interval=10, timeout=30)
+
+    assert timeline.events[-1].name == "state:PENDING"
+    assert clock.now == 1030.0
+    assert client.cancelled == "run-1"
+    assert timeline.timed_out
+    assert "EMR Serverless (run-1, timed out, cancelled)" in report([timeline])
+
+
+def test_record_cancels_containers_job_run_left_at_breakpoint():
+    clock = FakeClock()
+    client = FakeContainersClient(["PENDING", "RUNNING"])
+    runner = EMRContainersRunner(client, "vc-1", "arn:role", "emr-6.15.0-latest", "bucket")
+
+    timeline = record(runner, "s3://x", "", clock=clock, sleep=clock.sleep, poll_interval=10, timeout=60)
+
+    assert client.cancelled == "job-1"
+    assert timeline.timed_out
+
+
+def test_record_does_not_cancel_finished_runs():
+    clock = FakeClock()
+    client = FakeContainersClient(["PENDING", "COMPLETED"])
+    runner = EMRContainersRunner(client, "vc-1", "arn:role", "emr-6.15.0-latest", "bucket")
+
+    timeline = record(runner, "s3://x", "", clock=clock, sleep=clock.sleep, poll_interval=10)
+
+    assert client.cancelled is None
+    assert not timeline.timed_out
+
+
+def test_add_driver_markers_reads_gzipped_stdout():
+    runner = EMRServerlessRunner(None, "app-1", "arn:role", "bucket")
+    key = "logs/emr-serverless/applications/app-1/jobs/run-1/SPARK_DRIVER/stdout.gz"
+    timeline = Timeline(runner.platform, "run-1")
+
+    add_driver_markers(timeline, FakeS3({("bucket", key): gzip.compress(DRIVER_STDOUT.encode())}), runner)
+
+    assert "marker:spark_session_ready" in [e.name for e in timeline.events]
+
+
+def test_add_driver_markers_gives_up_when_logs_are_missing():
+    runner = EMRContainersRunner(None, "vc-1", "arn:role", "emr-6.15.0-latest", "bucket")
+    timeline = Timeline(runner.platform, "job-1")
+    sleeps = []
+
+    add_driver_markers(timeline, FakeS3({}), runner, sleep=sleeps.append, attempts=3)
+
+    assert timeline.events == []
+    assert len(sleeps) == 2
+
+
+def test_phases_and_report_from_canned_timelines():
+    eks = Timeline("EMR on EKS", "job-1")
+    for name, ts in [
+        ("submit", 1000.0),
+        ("state:PENDING", 1001.0),
+        ("state:SUBMITTED", 1005.0),
+        ("state:RUNNING", 1020.0),
+        ("marker:script_start", 1080.0),
+        ("marker:debugger_connect_start", 1081.0),
+        ("marker:debugger_attached", 1082.0),
+        ("marker:spark_session_ready", 1090.0),
+        ("state:COMPLETED", 1120.0),
+    ]:
+        eks.add(name, ts)
+    serverless = Timeline("EMR Serverless", "run-1")
+    for name, ts in [
+        ("submit", 1000.0),
+        ("state:SUBMITTED", 1000.5),
+        ("state:SCHEDULED", 1003.0),
+        ("state:RUNNING", 1010.0),
+        ("marker:script_start", 1015.0),
+        ("marker:debugger_connect_start", 1015.5),
+        ("marker:debugger_attached", 1016.0),
+        ("marker:spark_session_ready", 1025.0),
+        ("state:SUCCESS", 1040.0),
+    ]:
+        serverless.add(name, ts)
+
+    assert eks.phases() == [
+        ("job submission", 5.0),
+        ("scheduling / capacity", 15.0),
+        ("node provisioning, image pull, --archives unpack", 60.0),
+        ("Python startup", 1.0),
+        ("debugger connect, paused until Resume", 1.0),
+        ("Spark startup", 8.0),
+        ("job body", 30.0),
+    ]
+    assert eks.time_to_breakpoint() == 81.0
+    assert serverless.time_to_breakpoint() == 15.5
+
+    text = report([eks, serverless])
+    lines = text.splitlines()
+    assert "EMR on EKS (job-1)" in lines[0] and "EMR Serverless (run-1)" in lines[0]
+    scheduling = next(line for line in lines if line.startswith("scheduling  "))
+    assert scheduling.split()[-2:] == ["-", "2.5s"]
+    assert lines[-1].split()[-2:] == ["81.0s", "15.5s"]
+
+
+def test_duplicate_events_keep_first_timestamp():
+    timeline = Timeline("EMR on EKS")
+    timeline.add("state:RUNNING", 10.0)
+    timeline.add("state:RUNNING", 20.0)
+    assert timeline.events[0].timestamp == 10.0
+    assert timeline.time_to_breakpoint() is None
@@ -0,0 +1,37 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+
+from emr_remote_debugging.stacks.vpc import VPCStack
+
+
+def lifecycle_rule(ttl_days):
+    return {
+        "LifecycleConfiguration": {
+            "Rules": [
+                assertions.Match.object_like(
+                    {
+                        "Id": "StageCache",
+                        "Prefix": "cache/",
+                        "ExpirationInDays": ttl_days,
+                        "NoncurrentVersionExpiration": {"NoncurrentDays": 1},
+                        "Status": "Enabled",
+                    }
+                )
+            ]
+        }
+    }
+
+
+def test_stage_cache_lifecycle_rule():
+    stack = VPCStack(core.App(), "VPCStack")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::S3::Bucket", lifecycle_rule(7))
+    template.has_output("StageCacheURI", {})
+
+
+def test_stage_cache_ttl_from_context():
+    stack = VPCStack(core.App(context={"stage_cache_ttl_days": 3}), "VPCStack")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::S3::Bucket", lifecycle_rule(3))